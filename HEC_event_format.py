@@ -0,0 +1,165 @@
+import csv
+import io
+import json
+import re
+
+# Event flattening shared by the automated and manual scripts and the archive converter
+
+# Flattened event columns shared by the CSV and Parquet writers
+EVENT_COLUMNS = [
+    "eventId",
+    "customerId",
+    "saas",
+    "entityId",
+    "state",
+    "type",
+    "confidenceIndicator",
+    "eventCreated",
+    "severity",
+    "description",
+    "senderAddress",
+    "data",
+    "recipients",
+    "entityLink"
+]
+ACTION_COLUMNS = ["actionType", "actionCreateTime", "actionRelatedEntityId"]
+CHANGE_COLUMNS = ["changeType"]  # Incremental mode only: created or updated
+
+INDIA_HOST = 'cloudinfra-gw.in.portal.checkpoint.com'
+RECIPIENT_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
+def extract_recipients(description, sender=None):
+    """
+    Extracts every email address other than the sender from the description, in order
+    and without repeats, joined with ';'.
+    """
+    if not description:
+        return ""
+    addresses = dict.fromkeys(RECIPIENT_PATTERN.findall(description))
+    if sender:
+        addresses.pop(sender, None)
+    return ';'.join(addresses)
+
+def adjust_entity_link(entity_link, host):
+    """
+    Adjusts the entity link based on the provided host.
+    If the host is 'cloudinfra-gw.in.portal.checkpoint.com', replace 'portal.checkpoint.com'
+    in the entity link with 'in.portal.checkpoint.com'.
+    """
+    if host == INDIA_HOST and 'portal.checkpoint.com' in entity_link:
+        return entity_link.replace('portal.checkpoint.com', 'in.portal.checkpoint.com')
+    return entity_link
+
+# Turns events into EVENT_COLUMNS (+ ACTION_COLUMNS) rows. Host-specific work is decided
+# once up front, and each event's base row (including the data JSON) is built once and
+# shared by all of its action rows.
+class EventFlattener:
+    def __init__(self, host: str, tag_changes: bool = False, fields=None):
+        self.host = host
+        self.rewrite_links = host == INDIA_HOST
+        # Adds the changeType column written by incremental mode after the event columns
+        self.tag_changes = tag_changes
+        # Projection (--fields): only these columns are computed and serialized
+        self.fields = fields
+        self.event_columns = [column for column in EVENT_COLUMNS if not fields or column in fields]
+        self.with_actions = not fields or 'actions' in fields
+        self.extractors = [self._extractor(column) for column in self.event_columns]
+        # Scratch csv writer used to quote fields once per event
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer)
+
+    def entity_link(self, entity_link):
+        if self.rewrite_links and entity_link and 'portal.checkpoint.com' in entity_link:
+            return entity_link.replace('portal.checkpoint.com', 'in.portal.checkpoint.com')
+        return entity_link
+
+    def columns(self):
+        return (self.event_columns + (CHANGE_COLUMNS if self.tag_changes else [])
+                + (ACTION_COLUMNS if self.with_actions else []))
+
+    def _extractor(self, column):
+        if column == 'data':
+            return lambda event: json.dumps(event.get('data', ''))
+        if column == 'recipients':
+            return lambda event: extract_recipients(event.get('description', ''), event.get('senderAddress', ''))
+        if column == 'entityLink':
+            return lambda event: self.entity_link(event.get('entityLink', ''))
+        return lambda event: event.get(column, '')
+
+    def base_row(self, event):
+        if self.fields:
+            row = tuple(extract(event) for extract in self.extractors)
+            if self.tag_changes:
+                return row + (event.get('changeType', ''),)
+            return row
+        get = event.get
+        description = get('description', '')
+        sender = get('senderAddress', '')
+        row = (
+            get('eventId', ''),
+            get('customerId', ''),
+            get('saas', ''),
+            get('entityId', ''),
+            get('state', ''),
+            get('type', ''),
+            get('confidenceIndicator', ''),
+            get('eventCreated', ''),
+            get('severity', ''),
+            description,
+            sender,
+            json.dumps(get('data', '')),
+            extract_recipients(description, sender),
+            self.entity_link(get('entityLink', ''))
+        )
+        if self.tag_changes:
+            return row + (get('changeType', ''),)
+        return row
+
+    def rows(self, event):
+        base = self.base_row(event)
+        if not self.with_actions:
+            return [base]
+        actions = event.get('actions')
+        if not actions:
+            return [base + ('', '', '')]
+        return [
+            base + (action.get('actionType', ''), action.get('createTime', ''), action.get('relatedEntityId', ''))
+            for action in actions
+        ]
+
+    def _encode(self, rows):
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._csv.writerows(rows)
+        return self._buffer.getvalue()
+
+    def write_csv(self, file, writer, events):
+        """
+        Writes a batch of events as CSV rows. Rows go to writer.writerows in bulk; for events
+        with several actions the 14 base fields (including the large data JSON) are quoted
+        once and the encoded prefix is reused for every action row.
+        """
+        rows = []
+        for event in events:
+            actions = event.get('actions') if self.with_actions else None
+            if not actions or len(actions) == 1:
+                rows.extend(self.rows(event))
+                continue
+            if rows:
+                writer.writerows(rows)
+                rows = []
+            base = self._encode((self.base_row(event),))[:-2]
+            # Each action row is encoded on its own: a quoted field may itself contain "\r\n"
+            lines = []
+            for action in actions:
+                action_row = (action.get('actionType', ''), action.get('createTime', ''), action.get('relatedEntityId', ''))
+                lines.append(f"{base},{self._encode((action_row,))}")
+            file.write(''.join(lines))
+        if rows:
+            writer.writerows(rows)
+
+    def encode_csv(self, batch):
+        # CSV text for one batch, so flattening can run apart from the file write
+        chunk = io.StringIO()
+        self.write_csv(chunk, csv.writer(chunk), batch)
+        return chunk.getvalue(), len(batch)
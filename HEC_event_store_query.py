@@ -0,0 +1,65 @@
+import argparse
+
+from HEC_log_retirval_automated_bash import (BATCH_SIZE, EventStore, peek_events, save_to_csv, save_to_ndjson,
+                                             save_to_txt)
+
+# Columns printed for each event in table output
+TABLE_COLUMNS = ('eventCreated', 'severity', 'saas', 'type', 'state', 'senderAddress', 'eventId')
+
+def print_table(events):
+    print('  '.join(TABLE_COLUMNS))
+    printed = 0
+    for event in events:
+        print('  '.join(str(event.get(column, '')) for column in TABLE_COLUMNS))
+        printed += 1
+    print(f"{printed} events")
+
+def main():
+    # Queries the SQLite store written by HEC_log_retirval_automated_bash.py --file-type sqlite,
+    # so investigations don't spend API quota re-fetching events already collected
+    parser = argparse.ArgumentParser(description='Query events stored by the automated script and export them.')
+    parser.add_argument('--db', required=True, help='SQLite file written with --file-type sqlite')
+    parser.add_argument('--since', required=False, help='Only events created at or after this date (e.g. 2024-05-01 or 2024-05-01T12:00:00)')
+    parser.add_argument('--until', required=False, help='Only events created before this date')
+    parser.add_argument('--min-severity', type=int, required=False, help='Only events with at least this severity (1-5)')
+    parser.add_argument('--saas', required=False, help='e.g. office365_emails')
+    parser.add_argument('--type', required=False, help='Event type, e.g. phishing')
+    parser.add_argument('--state', required=False, help='Event state, e.g. remediated')
+    parser.add_argument('--sender', required=False, help='Sender address (case-insensitive)')
+    parser.add_argument('--recipient', required=False, help='Recipient address found in the description (case-insensitive)')
+    parser.add_argument('--action-type', required=False, help='Only events with an action of this type, e.g. quarantine')
+    parser.add_argument('--limit', type=int, required=False, help='Return at most this many events')
+    parser.add_argument('--count', action='store_true', help='Only print the number of matching events')
+    parser.add_argument('--format', choices=['table', 'csv', 'txt', 'ndjson'], default='table', help='Print a summary table or export in an output format of the automated script')
+    parser.add_argument('--output-file', required=False, help='File to export to (required for csv, txt and ndjson)')
+    args = parser.parse_args()
+
+    if args.format != 'table' and not args.output_file:
+        parser.error("--output-file is required for csv, txt and ndjson export")
+
+    with EventStore(args.db) as store:
+        events = store.query(since=args.since, until=args.until, min_severity=args.min_severity, saas=args.saas,
+                             event_type=args.type, state=args.state, sender=args.sender, recipient=args.recipient,
+                             action_type=args.action_type, limit=args.limit)
+        if args.count:
+            print(sum(1 for _ in events))
+            return
+        if args.format == 'table':
+            print_table(events)
+            return
+
+        events = peek_events(events)
+        if events is None:
+            print("No events match the query.")
+            return
+        # Exports match what the live sinks write, including the India entity-link rewrite
+        host = store.get_meta('host') or ''
+        if args.format == 'csv':
+            save_to_csv(events, args.output_file, host, buffer_size=BATCH_SIZE, append=False)
+        elif args.format == 'txt':
+            save_to_txt(events, args.output_file, buffer_size=BATCH_SIZE, append=False)
+        elif args.format == 'ndjson':
+            save_to_ndjson(events, args.output_file, host, buffer_size=BATCH_SIZE, append=False)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,30 @@
 import requests
 from uuid import uuid4
-from time import time
+from time import time, monotonic
 import json
 import csv
-import re
+import io
+import os
 from typing import List
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta, timezone
+
+# CSV rows are flattened exactly like the automated script's, recipients column included
+from HEC_event_format import EventFlattener, adjust_entity_link
+
+# Backfill tuning: each worker starts with this many sub-windows, and a sub-window
+# holding more than MAX_SHARD_EVENTS is split in half (down to MIN_SHARD_SECONDS)
+SHARDS_PER_WORKER = 4
+MAX_SHARD_EVENTS = 20000
+MIN_SHARD_SECONDS = 60
+BACKFILL_AHEAD = 2  # Sub-windows per worker fetched or held ahead of the one being written
+
+# Exports: sequential pulls query the range one shard at a time, and a checkpoint next to
+# the output file records the shard, scroll position and output offset after every page
+EXPORT_SHARD_SECONDS = 6 * 3600
+PROGRESS_INTERVAL = 10  # Seconds between progress lines
+OUTPUT_FILES = {'txt': 'HEC_log.txt', 'csv': 'HEC_log.csv', 'ndjson': 'HEC_log.ndjson'}
 
 class ApiClient:
     def __init__(self, client_id: str, access_key: str, host: str, api_version: str = 'v1.0'):
@@ -61,116 +81,315 @@ class ApiClient:
         res.raise_for_status()
         return res.json()
 
-    def query_events(self, start_date: str, end_date: str = None):
+    def query_event_pages(self, start_date: str, end_date: str = None, scroll_id: str = None):
         """
-        Query Security Events for a given date range.
+        Query Security Events for a given date range, following the scrollId
+        cursor and yielding each response page as it arrives. Passing a scroll_id
+        continues an earlier query from that page.
         """
         request_data = {
             'startDate': start_date,
             'endDate': end_date
         }
+        if scroll_id:
+            request_data['scrollId'] = scroll_id
         payload = {
             'requestData': request_data
         }
-        return self.call_api('POST', 'event/query', body=payload)
+        while True:
+            response = self.call_api('POST', 'event/query', body=payload)
+            yield response
+            scroll_id = next_scroll_id(response)
+            if not scroll_id:
+                break
+            request_data['scrollId'] = scroll_id
+
+def next_scroll_id(response):
+    """
+    Returns the cursor for the page after this one, or None when this is the last page.
+    """
+    if not response.get('responseData'):
+        return None
+    return (response.get('responseEnvelope') or {}).get('scrollId')
+
+def encode_txt_page(events, host):
+    """
+    Renders one response page the way HEC_log.txt stores it.
+    """
+    for event in events.get('responseData', []):
+        # Adjust the entity link if needed
+        event['entityLink'] = adjust_entity_link(event.get('entityLink', ''), host)
+    return json.dumps(events, indent=4) + "\n"  # Add a newline for better separation between appends
+
+def encode_ndjson_page(events, host):
+    """
+    Renders one response page as compact JSON lines, one event per line.
+    Empty responses render nothing.
+    """
+    lines = []
+    for event in events.get('responseData') or []:
+        event['entityLink'] = adjust_entity_link(event.get('entityLink', ''), host)
+        lines.append(json.dumps(event, separators=(',', ':')) + "\n")
+    return "".join(lines)
+
+def encode_csv_page(events, flattener, header=False):
+    """
+    Renders one response page as CSV rows, one row per action, with the same
+    flattening (columns, recipients, entity links) as the automated script.
+    """
+    buffer = io.StringIO()
+    if header:
+        csv.writer(buffer).writerow(flattener.columns())
+    buffer.write(flattener.encode_csv(events.get('responseData') or [])[0])
+    return buffer.getvalue()
 
-def extract_recipient(description):
+def parse_iso_date(value):
     """
-    Extracts the recipient's email from the description using a regular expression.
+    Parses an ISO 8601 timestamp such as 2024-01-01T00:00:00Z into an aware datetime.
     """
-    match = re.search(r"([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})", description)
-    return match.group(1) if match else ""
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
 
-def adjust_entity_link(entity_link, host):
+def format_iso_date(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def split_window(start, end, parts):
     """
-    Adjusts the entity link based on the provided host.
-    If the host is 'cloudinfra-gw.in.portal.checkpoint.com', replace 'portal.checkpoint.com'
-    in the entity link with 'in.portal.checkpoint.com'.
+    Splits [start, end) into `parts` consecutive sub-windows of equal length.
     """
-    if host == 'cloudinfra-gw.in.portal.checkpoint.com' and 'portal.checkpoint.com' in entity_link:
-        return entity_link.replace('portal.checkpoint.com', 'in.portal.checkpoint.com')
-    return entity_link
+    step = (end - start) / parts
+    bounds = [start + step * i for i in range(parts)] + [end]
+    return [(bounds[i], bounds[i + 1]) for i in range(parts)]
 
-def save_logs_to_txt(events, host):
+def fetch_shard(client, window):
     """
-    Saves logs to a .txt file.
+    Fetches every page of one sub-window. Returns None when the sub-window holds
+    more than MAX_SHARD_EVENTS and is still wide enough to be split.
     """
-    with open("HEC_log.txt", "a") as file:
-        for event in events.get('responseData', []):
-            # Adjust the entity link if needed
-            event['entityLink'] = adjust_entity_link(event.get('entityLink', ''), host)
-        file.write(json.dumps(events, indent=4))
-        file.write("\n")  # Add a newline for better separation between appends
-    print("Events successfully appended to 'HEC_log.txt'.")
+    start, end = window
+    splittable = (end - start).total_seconds() >= 2 * MIN_SHARD_SECONDS
+    events = []
+    for page in client.query_event_pages(format_iso_date(start), format_iso_date(end)):
+        events.extend(page.get('responseData') or [])
+        if splittable and len(events) > MAX_SHARD_EVENTS:
+            return None
+    events.sort(key=lambda event: event.get('eventCreated') or '')
+    return events
 
-def save_logs_to_csv(events, host):
+def backfill_events(client, start_date, end_date, workers):
     """
-    Saves logs to a .csv file.
+    Splits the date range into sub-windows, fetches them concurrently on a bounded
+    worker pool and yields each (sub-window, events) pair in eventCreated order.
+    At most BACKFILL_AHEAD sub-windows per worker are fetched or held at a time,
+    so memory does not grow with the length of the range.
     """
-    response_data = events.get('responseData', [])
-    
-    if response_data:
+    windows = split_window(parse_iso_date(start_date), parse_iso_date(end_date), workers * SHARDS_PER_WORKER)
+    # Authenticate once up front so the workers share the token
+    client.generate_authorization_token()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        completed = {}
+        submitted = 0
+        while windows:
+            # Windows are started in time order, so the next one to write is always in flight
+            while submitted < len(windows) and len(running) + len(completed) < workers * BACKFILL_AHEAD:
+                running[pool.submit(fetch_shard, client, windows[submitted])] = windows[submitted]
+                submitted += 1
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                window = running.pop(future)
+                events = future.result()
+                if events is None:
+                    # Too many records: replace the sub-window with its two halves
+                    halves = split_window(window[0], window[1], 2)
+                    position = windows.index(window)
+                    windows[position:position + 1] = halves
+                    for half in halves:
+                        running[pool.submit(fetch_shard, client, half)] = half
+                    submitted += 1
+                    print(f"Sub-window {format_iso_date(window[0])} - {format_iso_date(window[1])} too large, splitting.")
+                else:
+                    completed[window] = events
+
+            # Emit finished sub-windows strictly in time order
+            while windows and windows[0] in completed:
+                window = windows.pop(0)
+                submitted -= 1
+                yield window, completed.pop(window)
+
+def load_checkpoint(checkpoint_file):
+    try:
+        with open(checkpoint_file) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+class ExportWriter:
+    """
+    Appends an export to its output file page by page and checkpoints after every
+    page, so an interrupted export resumes from the last page that reached the disk.
+    """
+    def __init__(self, output_format: str, host: str, start_date: str, end_date: str, checkpoint: dict = None):
+        self.output_file = OUTPUT_FILES[output_format]
+        self.checkpoint_file = f"{self.output_file}.checkpoint"
+        self.output_format = output_format
+        self.host = host
+        self.flattener = EventFlattener(host)
+        self.file = open(self.output_file, 'ab')
+        if checkpoint:
+            # Cut off whatever was written after the last checkpointed page
+            self.file.truncate(checkpoint['offset'])
+            self.state = checkpoint
+        else:
+            offset = self.file.seek(0, os.SEEK_END)
+            self.state = {
+                'startDate': start_date,
+                'endDate': end_date,
+                'host': host,
+                'exportOffset': offset,  # Where this export's output begins
+                'shardStart': start_date,  # Everything before this is written
+                'shardEnd': None,
+                'shardOffset': offset,
+                'shardEvents': 0,
+                'scrollId': None,  # Cursor for the next page of the current shard
+                'offset': offset,
+                'events': 0
+            }
+        self.range_start = parse_iso_date(self.state['startDate'])
+        self.range_end = parse_iso_date(self.state['endDate'])
+        self.resumed_from = parse_iso_date(self.state['shardStart'])
+        self.position = self.resumed_from  # Estimated point in the range reached so far
+        self.resumed_events = self.state['events']
+        self.started = monotonic()
+        self.reported = self.started
+
+    def write_page(self, events, shard_start, shard_end, scroll_id):
+        """
+        Writes one page of the shard [shard_start, shard_end) and records scroll_id as the
+        cursor for its next page; None marks the shard as finished.
+        """
+        if self.output_format == 'txt':
+            text = encode_txt_page(events, self.host)
+        elif self.output_format == 'csv':
+            text = encode_csv_page(events, self.flattener, header=self.state['offset'] == 0)
+        else:
+            text = encode_ndjson_page(events, self.host)
+        self.file.write(text.encode('utf-8'))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+        state = self.state
+        state['offset'] = self.file.tell()
+        state['events'] += len(events.get('responseData') or [])
+        if scroll_id:
+            state['shardStart'] = format_iso_date(shard_start)
+            state['shardEnd'] = format_iso_date(shard_end)
+            state['scrollId'] = scroll_id
+            # Within a shard, the newest event written so far is the best progress estimate
+            created = [event.get('eventCreated') for event in events.get('responseData') or []]
+            created = [parse_iso_date(value) for value in created if value]
+            if created:
+                self.position = max(self.position, min(max(created), shard_end))
+        else:
+            self.position = shard_end
+            state['shardStart'] = format_iso_date(shard_end)
+            state['shardEnd'] = None
+            state['scrollId'] = None
+            state['shardOffset'] = state['offset']
+            state['shardEvents'] = state['events']
+        self.save_checkpoint()
+        if monotonic() - self.reported >= PROGRESS_INTERVAL:
+            self.report()
+
+    def restart_shard(self):
+        """
+        Drops the pages written for the current shard so it can be fetched again from its start.
+        """
+        state = self.state
+        self.file.truncate(state['shardOffset'])
+        state['offset'] = state['shardOffset']
+        state['events'] = state['shardEvents']
+        state['shardEnd'] = None
+        state['scrollId'] = None
+        self.save_checkpoint()
+
+    def save_checkpoint(self):
+        # Written atomically so a crash never leaves a corrupt checkpoint
+        temp_file = f"{self.checkpoint_file}.tmp"
+        with open(temp_file, 'w') as file:
+            json.dump(self.state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, self.checkpoint_file)
+
+    def report(self):
+        state = self.state
+        self.reported = monotonic()
+        elapsed = self.reported - self.started
+        done = self.position
+        total = (self.range_end - self.range_start).total_seconds()
+        percent = 100 * (done - self.range_start).total_seconds() / total if total > 0 else 100
+        # Rate and ETA only count this run, so a resumed export doesn't look faster than it is
+        events = state['events'] - self.resumed_events
+        rate = events / elapsed if elapsed else 0
+        covered = (done - self.resumed_from).total_seconds()
+        remaining = (self.range_end - done).total_seconds()
+        eta = str(timedelta(seconds=int(elapsed * remaining / covered))) if covered > 0 else 'unknown'
+        written = (state['offset'] - state['exportOffset']) / (1024 * 1024)
+        print(f"{percent:5.1f}% | {state['events']} events | {rate:.0f} events/s | {written:.1f} MB written | ETA {eta}")
+
+    def finish(self):
+        self.report()
+        self.close()
+        os.remove(self.checkpoint_file)
+        print(f"Export complete: {self.state['events']} events written to '{self.output_file}'.")
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+def export_sequential(client, writer):
+    """
+    Fetches the rest of the range one EXPORT_SHARD_SECONDS shard at a time, writing each
+    page as it arrives. A resumed shard continues from its saved scroll position.
+    """
+    state = writer.state
+    end = parse_iso_date(state['endDate'])
+    shard_start = parse_iso_date(state['shardStart'])
+    scroll_id = state['scrollId']
+    shard_end = parse_iso_date(state['shardEnd']) if scroll_id else None
+    while shard_start < end:
+        if shard_end is None:
+            shard_end = min(shard_start + timedelta(seconds=EXPORT_SHARD_SECONDS), end)
+        pages = client.query_event_pages(format_iso_date(shard_start), format_iso_date(shard_end), scroll_id)
         try:
-            with open("HEC_log.csv", "a", newline='') as file:
-                writer = csv.writer(file)
-                # Write the header if the file is empty
-                if file.tell() == 0:
-                    writer.writerow([
-                        "eventId", 
-                        "customerId", 
-                        "saas", 
-                        "entityId", 
-                        "state", 
-                        "type", 
-                        "confidenceIndicator", 
-                        "eventCreated", 
-                        "severity", 
-                        "description", 
-                        "senderAddress", 
-                        "data",
-                        "recipients",
-                        "entityLink", 
-                        "actionType", 
-                        "actionCreateTime", 
-                        "actionRelatedEntityId"
-                    ])
-                
-                for event in response_data:
-                    description = event.get('description', '')
-                    recipients = extract_recipient(description)
-                    entity_link = adjust_entity_link(event.get('entityLink', ''), host)
-                    
-                    base_data = [
-                        event.get('eventId', ''),
-                        event.get('customerId', ''),
-                        event.get('saas', ''),
-                        event.get('entityId', ''),
-                        event.get('state', ''),
-                        event.get('type', ''),
-                        event.get('confidenceIndicator', ''),
-                        event.get('eventCreated', ''),
-                        event.get('severity', ''),
-                        description,
-                        event.get('senderAddress', ''),
-                        json.dumps(event.get('data', '')),
-                        recipients,
-                        entity_link
-                    ]
-
-                    actions = event.get('actions', [])
-                    if actions:
-                        for action in actions:
-                            writer.writerow(base_data + [
-                                action.get('actionType', ''),
-                                action.get('createTime', ''),
-                                action.get('relatedEntityId', '')
-                            ])
-                    else:
-                        writer.writerow(base_data + ['', '', ''])
-                        
-            print("Events successfully appended to 'HEC_log.csv'.")
-        except Exception as e:
-            print(f"An error occurred while saving to CSV: {e}")
+            first_page = next(pages)
+        except requests.exceptions.HTTPError as e:
+            # Scroll cursors expire; fetch the shard again rather than give up on the export
+            if not scroll_id or e.response is None or e.response.status_code >= 500:
+                raise
+            print(f"Saved scroll position was rejected ({e.response.status_code}), restarting the shard at {format_iso_date(shard_start)}.")
+            writer.restart_shard()
+            scroll_id = None
+            continue
+        for page in chain([first_page], pages):
+            writer.write_page(page, shard_start, shard_end, next_scroll_id(page))
+        shard_start, shard_end, scroll_id = shard_end, None, None
+
+def export_backfill(client, writer, workers):
+    """
+    Fetches the rest of the range with backfill_events, writing each sub-window as it is emitted.
+    """
+    state = writer.state
+    if state['scrollId']:
+        # Sub-windows don't line up with a sequential shard, so start that shard over
+        writer.restart_shard()
+    for (start, end), events in backfill_events(client, state['shardStart'], state['endDate'], workers):
+        writer.write_page({'responseData': events}, start, end, None)
 
 def main():
     # Take user input
@@ -179,25 +398,59 @@ def main():
     start_date = input("Enter the start date (ISO 8601 format, e.g., 2024-01-01T00:00:00Z): ")
     end_date = input("Enter the end date (ISO 8601 format, e.g., 2024-01-31T23:59:59Z): ")
     host = input("Enter the host (e.g., 'cloudinfra-gw-us.portal.checkpoint.com'): ")
-    output_format = input("Enter the output format ('txt' or 'csv'): ").strip().lower()
+    output_format = input("Enter the output format ('txt', 'csv' or 'ndjson'): ").strip().lower()
+    workers = input("Enter the number of parallel workers for backfill (press Enter for 1): ").strip()
+    workers = int(workers) if workers else 1
 
     # Create the API client
     client = ApiClient(client_id, access_key, host)
 
-    # Query events within the specified date range
+    if output_format not in OUTPUT_FILES:
+        print("Invalid output format. Please specify 'txt', 'csv' or 'ndjson'.")
+        return
+
+    try:
+        start_date = format_iso_date(parse_iso_date(start_date))
+        end_date = format_iso_date(parse_iso_date(end_date))
+    except ValueError:
+        print("Invalid date. Please use ISO 8601 format, e.g., 2024-01-01T00:00:00Z.")
+        return
+
+    # An interrupted export of the same range resumes where it stopped
+    output_file = OUTPUT_FILES[output_format]
+    checkpoint = load_checkpoint(f"{output_file}.checkpoint")
+    if checkpoint:
+        if (checkpoint['startDate'], checkpoint['endDate'], checkpoint['host']) == (start_date, end_date, host):
+            print(f"Resuming the export at {checkpoint['shardStart']} ({checkpoint['events']} events already written).")
+        else:
+            answer = input(f"'{output_file}' has an unfinished export of {checkpoint['startDate']} - {checkpoint['endDate']}. "
+                           "Discard its checkpoint and start a new export? (y/N): ")
+            if answer.strip().lower() != 'y':
+                print("Run again with the same dates and host to resume it.")
+                return
+            # Keep the pages it completed, drop any partial one
+            os.truncate(output_file, checkpoint['offset'])
+            checkpoint = None
+
+    # Query events within the specified date range, saving each page as soon as it is available
+    writer = ExportWriter(output_format, host, start_date, end_date, checkpoint)
     try:
-        events = client.query_events(start_date, end_date)
-        # Save the logs in the specified format
-        if output_format == 'txt':
-            save_logs_to_txt(events, host)
-        elif output_format == 'csv':
-            save_logs_to_csv(events, host)
+        if workers > 1:
+            # Backfill: fetch sub-windows in parallel, save them in time order
+            export_backfill(client, writer, workers)
         else:
-            print("Invalid output format. Please specify 'txt' or 'csv'.")
+            export_sequential(client, writer)
+        writer.finish()
     except requests.exceptions.HTTPError as e:
         print(f"HTTP error occurred: {e}")
+    except KeyboardInterrupt:
+        print("Export interrupted.")
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        if not writer.file.closed:
+            writer.close()
+            print(f"Progress is saved in '{writer.checkpoint_file}'; run again with the same inputs to resume.")
 
 if __name__ == "__main__":
     main()
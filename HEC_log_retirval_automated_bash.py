@@ -1,45 +1,655 @@
 import requests
+from requests.adapters import HTTPAdapter
 from uuid import uuid4
-from time import time, sleep
+from time import time, sleep, monotonic
 import json
 import csv
+import re
 import argparse
 import logging
-import syslog
-from datetime import datetime, timedelta
+import socket
+import ssl
+from datetime import datetime, timedelta, timezone
+from itertools import islice, chain, count
+import heapq
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import asyncio
+import gzip
+import random
+import threading
+import queue
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
 import os
+import shutil
+import sqlite3
+from contextlib import contextmanager
+
+from HEC_event_format import EVENT_COLUMNS, EventFlattener, adjust_entity_link, extract_recipients
+
+try:
+    import syslog
+except ImportError:  # Not available on Windows; use --syslog-host to forward remotely instead
+    syslog = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: the token cache is still written atomically, just not locked across processes
+    fcntl = None
+
+try:
+    import aiohttp
+except ImportError:  # Only required by AsyncApiClient
+    aiohttp = None
+
+try:
+    import orjson
+except ImportError:  # Optional faster JSON backend for the ndjson writer
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # Only required for --rotate-compress zstd
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:  # Only required for --file-type parquet
+    pyarrow = None
 
 # Buffer size for batch processing
 BATCH_SIZE = 100  # Adjust this depending on your performance needs
+WRITE_BUFFER_SIZE = 1024 * 1024  # Bytes buffered before the ndjson writer hits the disk
+PARQUET_ROW_GROUP_SIZE = 50000  # Rows per Parquet row group; larger groups scan faster but use more memory
+SQLITE_BATCH_SIZE = 1000  # Events upserted per SQLite transaction
+
+# Remote syslog forwarding
+SYSLOG_BATCH_SIZE = 500  # Messages framed into one socket write over TCP/TLS
+SYSLOG_MAX_DATAGRAM = 65000  # UDP messages are truncated to fit one datagram
+SYSLOG_FACILITY = 16  # local0
+
+# Names accepted by --fields: the event columns, plus "actions" for the action columns/list
+FIELD_NAMES = EVENT_COLUMNS + ["actions"]
+
+# Polling schedule, all in seconds
+POLL_INTERVAL = 300  # How often a polling cycle starts
+SAFETY_LAG = 60  # Windows end this far behind now so late-indexed events are not skipped
+MAX_CATCHUP_WINDOW = 3600  # Largest window queried in one cycle when catching up after downtime
+
+# Adaptive scheduling (--adaptive): window bounds in seconds and the per-window volume to aim for
+MIN_WINDOW = 60
+MAX_WINDOW = 3600
+TARGET_EVENTS = 5000  # Shrink the window when one returns more events than this
+MAX_PAGES = 20  # ...or needs more scroll pages than this
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Closed output segments kept on disk by default when rotating
+ROTATE_KEEP = 10
+
+# eventIds remembered for deduplication across windows (about 100 bytes each)
+DEDUP_CAPACITY = 200000
+
+# HTTP collector sink (--file-type http): a batch is sent once it reaches either size, or lingers this long
+HTTP_BATCH_EVENTS = 500
+HTTP_BATCH_BYTES = 1024 * 1024  # Uncompressed NDJSON bytes per request body
+HTTP_LINGER = 1.0  # Seconds a partial batch waits for more events
+HTTP_CONCURRENCY = 4  # Uploads in flight over pooled connections
+
+# Incremental mode re-queries this many seconds before each window to pick up state and action changes
+LOOKBACK = 3600
+
+# Write-ahead spool (--spool-dir) between fetching and the sink
+SPOOL_SEGMENT_BYTES = 64 * 1024 * 1024  # Segment files roll over at this size
+SPOOL_MAX_BYTES = 1024 * 1024 * 1024  # Oldest segments are dropped beyond this, delivered or not
+SPOOL_DELIVERY_BATCH = 5000  # Events handed to the sink per write
+SPOOL_RETRY_INTERVAL = 30  # Seconds before a failed sink is retried
+
+# Pages (fetch stage) or encoded batches (transform stage) buffered between pipeline stages;
+# a full queue blocks the stage feeding it, so a slow sink slows the fetcher down
+PIPELINE_DEPTH = 4
+
+# Multi-tenant (--config) mode
+TENANT_WORKERS = 4  # Tenants fetched and written in parallel
+TENANT_PAGE_BUDGET = 5  # Scroll pages per turn before a tenant yields its worker
+
+# HTTP transport settings, shared by every call made through one ApiClient
+POOL_SIZE = 10  # Keep-alive connections kept open per host
+CONNECT_TIMEOUT = 5  # Seconds to establish the TCP/TLS connection
+READ_TIMEOUT = 60  # Seconds to wait for a response once connected
+
+# Retry policy for call_api
+MAX_RETRIES = 5  # Attempts after the first one before the error is raised
+BACKOFF_BASE = 1.0  # Seconds; the backoff ceiling doubles on every attempt
+BACKOFF_CAP = 60.0  # Longest single wait, also applied to Retry-After
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Bearer tokens are refreshed this many seconds before expiresIn runs out (at most half the lifetime)
+TOKEN_REFRESH_SKEW = 60
+
+# Bearer token for one client-id/host, shared by every ApiClient (and thread) in the process.
+# Tokens are refreshed early by a skew, and only one caller refreshes while the others wait.
+# With cache_file, the token is also kept in a 0600 JSON file guarded by an exclusive file
+# lock, so workers, processes and cron runs for the same client-id/host share one auth call
+# per token lifetime.
+class TokenProvider:
+    def __init__(self, client_id: str, host: str, cache_file: str = None, skew: float = TOKEN_REFRESH_SKEW):
+        # Entries are keyed by a hash, so the cache does not reveal which client-id it serves
+        self.key = hashlib.sha256(f"{client_id}@{host}".encode()).hexdigest()
+        self.cache_file = cache_file
+        self.skew = skew
+        self.lock = threading.Lock()
+        self.token = None
+        self.issued = None
+        self.expiry = 0.0
+        self.refresh_at = 0.0
+        self.rejected = None  # Token the API answered 401 to; never taken from the cache again
+        self.refreshes = 0
+
+    def valid(self):
+        return self.token is not None and time() < self.refresh_at
+
+    def _use(self, token, issued, expiry):
+        self.token = token
+        self.issued = issued
+        self.expiry = expiry
+        self.refresh_at = expiry - min(self.skew, (expiry - issued) / 2)
+
+    def get(self, request_token):
+        """
+        Returns a valid token. request_token() performs the auth call and returns (token, expires_in).
+        """
+        if self.valid():
+            return self.token
+        with self.lock:
+            # Another thread may have refreshed while this one waited for the lock
+            if self.valid():
+                return self.token
+            if not self.cache_file:
+                self._refresh(request_token)
+                return self.token
+            with self._file_lock():
+                cached = self._read_cache().get(self.key)
+                if cached and cached['token'] != self.rejected:
+                    self._use(cached['token'], cached['issued'], cached['expiry'])
+                    if self.valid():
+                        return self.token
+                self._refresh(request_token)
+                self._write_cache()
+            return self.token
+
+    def _refresh(self, request_token):
+        issued = time()
+        token, expires_in = request_token()
+        self.refreshes += 1
+        self._use(token, issued, issued + expires_in)
+
+    def invalidate(self, token):
+        """
+        Drops a token the API rejected. Threads that all got a 401 for the same token
+        trigger a single refresh between them.
+        """
+        with self.lock:
+            if self.token == token:
+                self.rejected = token
+                self.token = None
+
+    @contextmanager
+    def _file_lock(self):
+        fd = os.open(f"{self.cache_file}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_file) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_cache(self):
+        cache = self._read_cache()
+        now = time()
+        # Drop other clients' expired tokens while rewriting
+        cache = {key: entry for key, entry in cache.items() if entry.get('expiry', 0) > now}
+        cache[self.key] = {'token': self.token, 'issued': self.issued, 'expiry': self.expiry}
+        temp_file = f"{self.cache_file}.tmp"
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as file:
+            json.dump(cache, file)
+        os.chmod(temp_file, 0o600)
+        os.replace(temp_file, self.cache_file)
+
+_token_providers = {}
+_token_providers_lock = threading.Lock()
+
+def shared_token_provider(client_id, host, cache_file=None, skew=TOKEN_REFRESH_SKEW):
+    key = (client_id, host, cache_file)
+    with _token_providers_lock:
+        if key not in _token_providers:
+            _token_providers[key] = TokenProvider(client_id, host, cache_file, skew)
+        return _token_providers[key]
+
+# Thread-safe token bucket that keeps callers under a request-per-second quota
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes one token, sleeping until one is available. Returns the seconds waited.
+        """
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            # A negative balance is this caller's place in the queue
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            sleep(wait)
+        return wait
+
+def backoff_delay(attempt: int):
+    # Full jitter: uniform between 0 and the exponential ceiling
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def retry_after_delay(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), BACKOFF_CAP)
+
+# Prometheus metric names, types and help text
+METRIC_DEFINITIONS = {
+    'hec_auth_requests_total': ('counter', 'Calls to /auth/external by result'),
+    'hec_token_age_seconds': ('gauge', 'Seconds since the current bearer token was issued'),
+    'hec_api_requests_total': ('counter', 'API calls by endpoint and HTTP status'),
+    'hec_api_request_duration_seconds': ('histogram', 'API call latency by endpoint'),
+    'hec_api_retries_total': ('counter', 'API calls retried after 429/5xx/401 or a connection error'),
+    'hec_api_throttled_total': ('counter', 'API calls delayed by the client-side rate limiter'),
+    'hec_pages_fetched_total': ('counter', 'Event query pages fetched'),
+    'hec_events_fetched_total': ('counter', 'Events fetched from the API'),
+    'hec_events_written_total': ('counter', 'Events handed to an output sink'),
+    'hec_bytes_written_total': ('counter', 'Bytes written by an output sink'),
+    'hec_windows_total': ('counter', 'Polling windows processed by result'),
+    'hec_watermark_lag_seconds': ('gauge', 'Seconds between now and the end of the last written window'),
+    'hec_spool_backlog_bytes': ('gauge', 'Spooled bytes not yet delivered to the sink'),
+    'hec_spool_dropped_bytes_total': ('counter', 'Spooled bytes dropped oldest-first to stay under the size limit'),
+}
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _metric_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), " ")}"'
+               for key, value in sorted(labels.items()))
+    return '{' + ','.join(escaped) + '}'
+
+# Small thread-safe registry rendered in the Prometheus text format, either served over
+# HTTP (/metrics) or written to a node_exporter textfile-collector file
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}  # (name, labels) -> value, for counters and gauges
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.callbacks = {}  # (name, labels) -> function returning the current value
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.values[self._key(name, labels)] = value
+
+    def set_function(self, name, function, **labels):
+        """
+        Registers a value computed at render time, e.g. an age or a counter kept elsewhere.
+        """
+        with self.lock:
+            self.callbacks[self._key(name, labels)] = function
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def render(self):
+        with self.lock:
+            samples = dict(self.values)
+            histograms = {key: list(value) for key, value in self.histograms.items()}
+            callbacks = dict(self.callbacks)
+        for key, function in callbacks.items():
+            try:
+                value = function()
+            except Exception:
+                continue
+            if value is not None:
+                samples[key] = value
+
+        lines = []
+        for name, (metric_type, help_text) in METRIC_DEFINITIONS.items():
+            series = [(dict(labels), value) for (metric, labels), value in samples.items() if metric == name]
+            buckets = [(dict(labels), value) for (metric, labels), value in histograms.items() if metric == name]
+            if not series and not buckets:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in series:
+                lines.append(f"{name}{_metric_labels(labels)} {value}")
+            for labels, histogram in buckets:
+                for bound, count in zip(LATENCY_BUCKETS, histogram):
+                    lines.append(f"{name}_bucket{_metric_labels({**labels, 'le': bound})} {count}")
+                lines.append(f"{name}_bucket{_metric_labels({**labels, 'le': '+Inf'})} {histogram[-1]}")
+                lines.append(f"{name}_sum{_metric_labels(labels)} {histogram[-2]}")
+                lines.append(f"{name}_count{_metric_labels(labels)} {histogram[-1]}")
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        temp_file = f"{path}.tmp"
+        with open(temp_file, 'w') as file:
+            file.write(self.render())
+        os.replace(temp_file, path)
+
+    def serve(self, port, bind=''):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((bind, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+        return server
+
+# Process-wide registry used by the client, the writers and the poll loop
+METRICS = Metrics()
+
+# Build a pooled keep-alive session so pages reuse connections instead of re-handshaking
+def create_session(pool_size: int = POOL_SIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive'
+    })
+    return session
 
 class ApiClient:
-    def __init__(self, client_id: str, access_key: str, host: str, api_version: str = 'v1.0'):
+    def __init__(self, client_id: str, access_key: str, host: str, api_version: str = 'v1.0',
+                 pool_size: int = POOL_SIZE, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, scheme: str = 'https',
+                 max_retries: int = MAX_RETRIES, rate_limit: float = None, rate_burst: float = None,
+                 metric_labels: dict = None, token_cache: str = None, token_skew: float = TOKEN_REFRESH_SKEW):
+        self.client_id = client_id
+        self.access_key = access_key
+        self.tokens = shared_token_provider(client_id, host, token_cache, token_skew)
+        self.host = host
+        self.api_version = api_version
+        self.base_url = f'{scheme}://{host}'
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = create_session(pool_size)
+        self.max_retries = max_retries
+        self.rate_limiter = TokenBucket(rate_limit, rate_burst) if rate_limit else None
+        self.retries = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        # Volume of the most recent iter_event_pages() run, used by the adaptive scheduler
+        self.last_query_pages = 0
+        self.last_query_events = 0
+        # Extra labels (e.g. tenant) on every series this client reports
+        self.metric_labels = metric_labels or {}
+        METRICS.set_function('hec_token_age_seconds', lambda: time() - self.tokens.issued if self.tokens.issued else None,
+                             **self.metric_labels)
+        METRICS.set_function('hec_api_retries_total', lambda: self.retries, **self.metric_labels)
+        METRICS.set_function('hec_api_throttled_total', lambda: self.throttled, **self.metric_labels)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def should_refresh_token(self):
+        return not self.tokens.valid()
+
+    def _request_token(self):
+        payload = {
+            "clientId": self.client_id,
+            "accessKey": self.access_key
+        }
+        res = self.session.post(f'{self.base_url}/auth/external', json=payload, timeout=self.timeout)
+        METRICS.inc('hec_auth_requests_total', status=res.status_code, **self.metric_labels)
+        res.raise_for_status()
+        res_data = res.json()['data']
+        return res_data['token'], res_data['expiresIn']
+
+    def generate_authorization_token(self):
+        return self.tokens.get(self._request_token)
+
+    def headers(self, token: str = None):
+        token = token or self.generate_authorization_token()
+        request_id = str(uuid4())
+        headers = {
+            'Authorization': f'Bearer {token}',
+            'x-av-req-id': request_id
+        }
+        return headers
+
+    # Retries 429/5xx and connection errors with jittered backoff (or Retry-After),
+    # and a 401 once with a freshly generated token
+    def call_api(self, method: str, endpoint: str, params: dict = None, body: dict = None):
+        attempt = 0
+        token_refreshed = False
+        while True:
+            if self.rate_limiter:
+                waited = self.rate_limiter.acquire()
+                if waited:
+                    self.throttled += 1
+                    self.throttled_seconds += waited
+            token = self.generate_authorization_token()
+            headers = self.headers(token)
+            started = monotonic()
+            try:
+                res = self.session.request(
+                    method, 
+                    f'{self.base_url}/app/hec-api/{self.api_version}/{endpoint}',
+                    headers=headers, 
+                    params=params, 
+                    json=body,
+                    timeout=self.timeout
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                METRICS.inc('hec_api_requests_total', endpoint=endpoint, status='error', **self.metric_labels)
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                reason = type(e).__name__
+            else:
+                METRICS.observe('hec_api_request_duration_seconds', monotonic() - started, endpoint=endpoint,
+                                **self.metric_labels)
+                METRICS.inc('hec_api_requests_total', endpoint=endpoint, status=res.status_code, **self.metric_labels)
+                if res.status_code == 401 and not token_refreshed:
+                    # The token may have been revoked or expired early: force a new one
+                    token_refreshed = True
+                    self.tokens.invalidate(token)
+                    self.retries += 1
+                    continue
+                if res.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    res.raise_for_status()
+                    return res.json()
+                delay = retry_after_delay(res)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                reason = f"HTTP {res.status_code}"
+
+            attempt += 1
+            self.retries += 1
+            print(f"{reason} on {endpoint}, retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            sleep(delay)
+
+    def retry_stats(self):
+        return f"{self.retries} retries, {self.throttled} throttled calls ({self.throttled_seconds:.1f}s waiting)"
+
+    # Follow the scrollId cursor and yield one page of events at a time
+    def iter_event_pages(self, start_date: str, end_date: str = None, filters: dict = None):
+        request_data = {
+            'startDate': start_date,
+            'endDate': end_date
+        }
+        # Server-side filters (severities, saas, eventTypes, eventStates) cut the payload at the source
+        if filters:
+            request_data.update(filters)
+        payload = {'requestData': request_data}
+        self.last_query_pages = 0
+        self.last_query_events = 0
+
+        while True:
+            response = self.call_api('POST', 'event/query', body=payload)
+            events = response.get('responseData') or []
+            self.last_query_pages += 1
+            self.last_query_events += len(events)
+            METRICS.inc('hec_pages_fetched_total', **self.metric_labels)
+            METRICS.inc('hec_events_fetched_total', len(events), **self.metric_labels)
+            if events:
+                yield events
+
+            # The API returns a null scrollId once the last page has been served
+            scroll_id = (response.get('responseEnvelope') or {}).get('scrollId')
+            if not scroll_id or not events:
+                break
+            request_data['scrollId'] = scroll_id
+
+    # Stream events for large result sets without holding every page in memory
+    def query_events(self, start_date: str, end_date: str = None, filters: dict = None):
+        for page in self.iter_event_pages(start_date, end_date, filters):
+            yield from page
+
+# asyncio sibling of ApiClient: many scroll chains share one event loop and connection pool
+class AsyncApiClient:
+    def __init__(self, client_id: str, access_key: str, host: str, api_version: str = 'v1.0',
+                 max_in_flight: int = POOL_SIZE, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, scheme: str = 'https'):
+        if aiohttp is None:
+            raise RuntimeError("AsyncApiClient requires aiohttp: pip install aiohttp")
         self.client_id = client_id
         self.access_key = access_key
         self.token = None
         self.token_expiry = None
+        self.token_refresh_at = None
         self.host = host
         self.api_version = api_version
+        self.base_url = f'{scheme}://{host}'
+        self.max_in_flight = max_in_flight
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.session = None
+        # Created lazily so the client can be built outside a running event loop
+        self._semaphore = None
+        self._token_refresh = None
+
+    async def _get_session(self):
+        if self.session is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout,
+                                                 headers={'Accept-Encoding': 'gzip, deflate'})
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
 
     def should_refresh_token(self):
-        return not self.token or time() >= self.token_expiry
+        return not self.token or time() >= self.token_refresh_at
 
-    def generate_authorization_token(self):
-        if self.should_refresh_token():
-            payload = {
-                "clientId": self.client_id,
-                "accessKey": self.access_key
-            }
-            timestamp = time()
-            res = requests.post(f'https://{self.host}/auth/external', json=payload)
+    async def _refresh_token(self):
+        session = await self._get_session()
+        payload = {
+            "clientId": self.client_id,
+            "accessKey": self.access_key
+        }
+        timestamp = time()
+        async with session.post(f'{self.base_url}/auth/external', json=payload) as res:
             res.raise_for_status()
-            res_data = res.json()['data']
-            self.token = res_data['token']
-            self.token_expiry = timestamp + res_data['expiresIn']
+            res_data = (await res.json())['data']
+        self.token = res_data['token']
+        self.token_expiry = timestamp + res_data['expiresIn']
+        # Refresh early, like TokenProvider, so no request leaves with a token about to expire
+        self.token_refresh_at = self.token_expiry - min(TOKEN_REFRESH_SKEW, res_data['expiresIn'] / 2)
         return self.token
 
-    def headers(self):
-        token = self.generate_authorization_token()
+    async def generate_authorization_token(self):
+        if not self.should_refresh_token():
+            return self.token
+        # Coalesce refreshes: every caller waiting on an expired token shares one auth call
+        if self._token_refresh is None:
+            self._token_refresh = asyncio.ensure_future(self._refresh_token())
+        refresh = self._token_refresh
+        try:
+            # Shielded so a cancelled caller does not cancel the refresh the others wait on
+            return await asyncio.shield(refresh)
+        finally:
+            if refresh.done() and self._token_refresh is refresh:
+                self._token_refresh = None
+
+    async def headers(self):
+        token = await self.generate_authorization_token()
         request_id = str(uuid4())
         headers = {
             'Authorization': f'Bearer {token}',
@@ -47,168 +657,1600 @@ class ApiClient:
         }
         return headers
 
-    def call_api(self, method: str, endpoint: str, params: dict = None, body: dict = None):
-        res = requests.request(
-            method, 
-            f'https://{self.host}/app/hec-api/{self.api_version}/{endpoint}',
-            headers=self.headers(), 
-            params=params, 
-            json=body
-        )
-        res.raise_for_status()
-        return res.json()
+    async def call_api(self, method: str, endpoint: str, params: dict = None, body: dict = None):
+        session = await self._get_session()
+        # Headers (and any token refresh) are resolved before taking a slot, so auth never waits on the cap
+        headers = await self.headers()
+        async with self._semaphore:
+            async with session.request(
+                method,
+                f'{self.base_url}/app/hec-api/{self.api_version}/{endpoint}',
+                headers=headers,
+                params=params,
+                json=body
+            ) as res:
+                res.raise_for_status()
+                return await res.json()
 
-    # Handle pagination for large result sets
-    def query_events(self, start_date: str, end_date: str = None):
-        all_events = []
+    # Follow the scrollId cursor and yield one page of events at a time
+    async def iter_event_pages(self, start_date: str, end_date: str = None):
         request_data = {
             'startDate': start_date,
             'endDate': end_date
         }
         payload = {'requestData': request_data}
-        
-        # Initial request
-        response = self.call_api('POST', 'event/query', body=payload)
-        all_events.extend(response.get('responseData', []))
-        
-        # Handle pagination (assuming API provides a 'nextPageToken' or similar mechanism)
-        while response.get('nextPageToken'):
-            payload['requestData']['pageToken'] = response['nextPageToken']
-            response = self.call_api('POST', 'event/query', body=payload)
-            all_events.extend(response.get('responseData', []))
-        
-        return all_events
+
+        while True:
+            response = await self.call_api('POST', 'event/query', body=payload)
+            events = response.get('responseData') or []
+            if events:
+                yield events
+
+            scroll_id = (response.get('responseEnvelope') or {}).get('scrollId')
+            if not scroll_id or not events:
+                break
+            request_data['scrollId'] = scroll_id
+
+    async def query_events(self, start_date: str, end_date: str = None):
+        async for page in self.iter_event_pages(start_date, end_date):
+            for event in page:
+                yield event
+
+# Run one scroll chain per (start_date, end_date) window concurrently on a single event loop.
+# on_page(window, events) is called for every page as it arrives; returns events fetched per window.
+async def fetch_windows_async(client: AsyncApiClient, windows, on_page):
+    async def run_window(window):
+        fetched = 0
+        async for events in client.iter_event_pages(*window):
+            on_page(window, events)
+            fetched += len(events)
+        return fetched
+
+    return await asyncio.gather(*(run_window(window) for window in windows))
+
+# Returns the event stream unchanged, or None if it turns out to be empty
+def peek_events(events):
+    iterator = iter(events)
+    first = next(iterator, None)
+    if first is None:
+        return None
+    return chain([first], iterator)
+
+# Group an event stream into lists of at most buffer_size events
+def iter_batches(events, buffer_size):
+    iterator = iter(events)
+    while True:
+        batch = list(islice(iterator, buffer_size))
+        if not batch:
+            return
+        yield batch
+
+# Runs an iterable on a background thread behind a bounded queue, so producing the next items
+# (network reads, flattening) overlaps with whatever the consumer does with the current one.
+# Exceptions are re-raised in the consumer; closing the generator stops the producer.
+def pipelined(iterable, depth=PIPELINE_DEPTH, name='pipeline'):
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    end = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((None, item)):
+                    return
+            put((end, None))
+        except BaseException as e:
+            put((end, e))
+
+    threading.Thread(target=produce, name=name, daemon=True).start()
+    try:
+        while True:
+            marker, item = items.get()
+            if marker is end:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+
+# Writes (chunk, event_count) pairs from an encoder, optionally on a transformer thread
+def write_chunks(file, chunks, pipeline_depth=0):
+    if pipeline_depth:
+        chunks = pipelined(chunks, pipeline_depth, name='transform')
+    written = 0
+    for chunk, events in chunks:
+        file.write(chunk)
+        written += events
+    return written
+
+# Keeps only the projected fields of an event for the JSON writers; "recipients" is derived
+# from the description like the CSV column, and an incremental changeType tag is always kept
+def project_event(event, fields):
+    projected = {name: event[name] for name in fields if name in event}
+    if 'recipients' in fields:
+        projected['recipients'] = extract_recipients(event.get('description', ''), event.get('senderAddress', ''))
+    if 'changeType' in event:
+        projected['changeType'] = event['changeType']
+    return projected
+
+def txt_encoder(fields=None):
+    def encode(batch):
+        if fields:
+            batch = [project_event(event, fields) for event in batch]
+        return ''.join(json.dumps(event, indent=4) + "\n" for event in batch), len(batch)
+    return encode
+
+encode_txt = txt_encoder()
 
 # Buffer-based function to save logs to TXT
-def save_to_txt(log_data, file_path, buffer_size, append=True):
+def save_to_txt(log_data, file_path, buffer_size, append=True, pipeline_depth=0, fields=None):
     mode = 'a' if append else 'w'
     with open(file_path, mode) as file:
-        for i in range(0, len(log_data), buffer_size):
-            batch = log_data[i:i + buffer_size]
-            for event in batch:
-                file.write(json.dumps(event, indent=4))
-                file.write("\n")
-        print(f"Batch of {buffer_size} events appended to {file_path}")
+        written = write_chunks(file, map(txt_encoder(fields), iter_batches(log_data, buffer_size)), pipeline_depth)
+    print(f"{written} events appended to {file_path}")
+
+# Serialize one event as a compact JSON line, using orjson when it is installed
+if orjson is not None:
+    def dumps_line(event):
+        return orjson.dumps(event, option=orjson.OPT_APPEND_NEWLINE)
+else:
+    _compact_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+    def dumps_line(event):
+        return (_compact_encoder.encode(event) + '\n').encode('utf-8')
+
+def ndjson_encoder(host, fields=None):
+    def encode(batch):
+        if fields:
+            batch = [project_event(event, fields) for event in batch]
+        for event in batch:
+            if 'entityLink' in event:
+                event['entityLink'] = adjust_entity_link(event['entityLink'], host)
+        return b''.join(map(dumps_line, batch)), len(batch)
+    return encode
+
+# Newline-delimited JSON: one compact line per event, written through a large buffer
+def save_to_ndjson(log_data, file_path, host, buffer_size, append=True, pipeline_depth=0, fields=None):
+    mode = 'ab' if append else 'wb'
+    with open(file_path, mode, buffering=WRITE_BUFFER_SIZE) as file:
+        written = write_chunks(file, map(ndjson_encoder(host, fields), iter_batches(log_data, buffer_size)),
+                               pipeline_depth)
+    print(f"{written} events appended to {file_path}")
 
 # Buffer-based function to save logs to CSV
-def save_to_csv(log_data, file_path, host, buffer_size, append=True):
+def save_to_csv(log_data, file_path, host, buffer_size, append=True, pipeline_depth=0, tag_changes=False,
+                fields=None):
     mode = 'a' if append else 'w'
-    file_exists = os.path.isfile(file_path)
+    flattener = EventFlattener(host, tag_changes, fields)
 
     with open(file_path, mode, newline='') as file:
-        writer = csv.writer(file)
         if file.tell() == 0:  # Write header only once
-            writer.writerow([
-                "eventId", 
-                "customerId", 
-                "saas", 
-                "entityId", 
-                "state", 
-                "type", 
-                "confidenceIndicator", 
-                "eventCreated", 
-                "severity", 
-                "description", 
-                "senderAddress", 
-                "data",
-                "recipients",
-                "entityLink", 
-                "actionType", 
-                "actionCreateTime", 
-                "actionRelatedEntityId"
+            csv.writer(file).writerow(flattener.columns())
+
+        # Flatten each batch into one CSV chunk
+        written = write_chunks(file, map(flattener.encode_csv, iter_batches(log_data, buffer_size)), pipeline_depth)
+
+        print(f"{written} events appended to {file_path}")
+
+def parquet_schema():
+    action_type = pyarrow.struct([
+        ("actionType", pyarrow.string()),
+        ("createTime", pyarrow.string()),
+        ("relatedEntityId", pyarrow.string())
+    ])
+    fields = [(column, pyarrow.string()) for column in EVENT_COLUMNS]
+    fields.append(("actions", pyarrow.list_(action_type)))
+    return pyarrow.schema(fields)
+
+def _parquet_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+# Columnar sink: one row per event with actions kept as a nested list, written in row
+# groups to <output_dir>/date=YYYY-MM-DD/ so DuckDB/pandas can prune by event date
+def save_to_parquet(log_data, output_dir, host, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    if pyarrow is None:
+        raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow")
+    schema = parquet_schema()
+    flattener = EventFlattener(host)
+    part_name = f"part-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid4().hex[:8]}.parquet"
+    writers = {}
+    buffers = {}
+    written = 0
+
+    def flush(partition):
+        columns = buffers.pop(partition)
+        if partition not in writers:
+            directory = os.path.join(output_dir, f"date={partition}")
+            os.makedirs(directory, exist_ok=True)
+            writers[partition] = parquet.ParquetWriter(os.path.join(directory, part_name), schema, compression='zstd')
+        writers[partition].write_table(pyarrow.Table.from_pydict(columns, schema=schema), row_group_size=row_group_size)
+
+    try:
+        for event in log_data:
+            partition = str(event.get('eventCreated') or '')[:10] or 'unknown'
+            columns = buffers.get(partition)
+            if columns is None:
+                columns = buffers[partition] = {name: [] for name in schema.names}
+            for name, value in zip(EVENT_COLUMNS, flattener.base_row(event)):
+                columns[name].append(_parquet_text(value))
+            columns["actions"].append([
+                {
+                    "actionType": _parquet_text(action.get('actionType')),
+                    "createTime": _parquet_text(action.get('createTime')),
+                    "relatedEntityId": _parquet_text(action.get('relatedEntityId'))
+                }
+                for action in event.get('actions') or []
             ])
+            written += 1
+            if len(columns["eventId"]) >= row_group_size:
+                flush(partition)
+        for partition in list(buffers):
+            flush(partition)
+    finally:
+        for writer in writers.values():
+            writer.close()
 
-        # Process in batches
-        for i in range(0, len(log_data), buffer_size):
-            batch = log_data[i:i + buffer_size]
-            for event in batch:
-                description = event.get('description', '')
-                recipients = extract_recipient(description)
-                entity_link = adjust_entity_link(event.get('entityLink', ''), host)
-
-                base_data = [
-                    event.get('eventId', ''),
-                    event.get('customerId', ''),
-                    event.get('saas', ''),
-                    event.get('entityId', ''),
-                    event.get('state', ''),
-                    event.get('type', ''),
-                    event.get('confidenceIndicator', ''),
-                    event.get('eventCreated', ''),
-                    event.get('severity', ''),
-                    description,
-                    event.get('senderAddress', ''),
-                    json.dumps(event.get('data', '')),
-                    recipients,
-                    entity_link
-                ]
-
-                actions = event.get('actions', [])
-                if actions:
-                    for action in actions:
-                        writer.writerow(base_data + [
-                            action.get('actionType', ''),
-                            action.get('createTime', ''),
-                            action.get('relatedEntityId', '')
-                        ])
-                else:
-                    writer.writerow(base_data + ['', '', ''])
+    print(f"{written} events written to {len(writers)} date partitions under {output_dir}")
+    return sum(os.path.getsize(os.path.join(output_dir, f"date={partition}", part_name)) for partition in writers)
+
+# Embedded SQLite store: one row per eventId (upserted), with its actions and recipients
+# normalised into their own tables and the fields investigations filter on indexed
+EVENT_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    eventId TEXT PRIMARY KEY,
+    customerId TEXT,
+    saas TEXT,
+    entityId TEXT,
+    state TEXT,
+    type TEXT,
+    confidenceIndicator TEXT,
+    eventCreated TEXT,
+    severity INTEGER,
+    senderAddress TEXT COLLATE NOCASE,
+    entityLink TEXT,
+    event TEXT NOT NULL,
+    storedAt TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS actions (
+    eventId TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    actionType TEXT,
+    createTime TEXT,
+    relatedEntityId TEXT,
+    PRIMARY KEY (eventId, position)
+);
+CREATE TABLE IF NOT EXISTS recipients (
+    eventId TEXT NOT NULL,
+    address TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (eventId, address)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS events_created ON events (eventCreated);
+CREATE INDEX IF NOT EXISTS events_severity ON events (severity, eventCreated);
+CREATE INDEX IF NOT EXISTS events_saas ON events (saas, eventCreated);
+CREATE INDEX IF NOT EXISTS events_type ON events (type, eventCreated);
+CREATE INDEX IF NOT EXISTS events_sender ON events (senderAddress);
+CREATE INDEX IF NOT EXISTS recipients_address ON recipients (address);
+CREATE INDEX IF NOT EXISTS actions_type ON actions (actionType);
+"""
+
+class EventStore:
+    COLUMNS = ('eventId', 'customerId', 'saas', 'entityId', 'state', 'type', 'confidenceIndicator',
+               'eventCreated', 'severity', 'senderAddress', 'entityLink', 'event', 'storedAt')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        # WAL lets the query CLI read while the poller writes
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(EVENT_STORE_SCHEMA)
+        updates = ', '.join(f"{column}=excluded.{column}" for column in self.COLUMNS[1:])
+        self.upsert_sql = (f"INSERT INTO events ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))}) "
+                           f"ON CONFLICT(eventId) DO UPDATE SET {updates}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_meta(self, key):
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def upsert(self, events, flattener: EventFlattener):
+        """
+        Inserts or replaces a batch of events in one transaction. Actions and recipients of an
+        event already in the store are replaced with the new ones.
+        """
+        stored_at = datetime.now(timezone.utc).strftime(DATE_FORMAT)
+        # A batch can carry the same event twice (e.g. an update replayed from the spool next to
+        # the original); the last copy wins, as it would across separate batches
+        latest = {}
+        for event in events:
+            if event.get('eventId'):
+                latest[event['eventId']] = event
+        rows, actions, recipients = [], [], []
+        for event_id, event in latest.items():
+            get = event.get
+            sender = get('senderAddress', '')
+            rows.append((event_id, get('customerId'), get('saas'), get('entityId'), get('state'), get('type'),
+                         get('confidenceIndicator'), get('eventCreated'), get('severity'), sender,
+                         flattener.entity_link(get('entityLink', '')), json.dumps(event), stored_at))
+            actions.extend((event_id, position, action.get('actionType'), action.get('createTime'),
+                            action.get('relatedEntityId'))
+                           for position, action in enumerate(get('actions') or []))
+            found = extract_recipients(get('description', ''), sender)
+            recipients.extend((event_id, address) for address in dict.fromkeys(found.split(';')) if address)
+
+        with self.connection:
+            self.connection.executemany(self.upsert_sql, rows)
+            event_ids = [(row[0],) for row in rows]
+            self.connection.executemany('DELETE FROM actions WHERE eventId = ?', event_ids)
+            self.connection.executemany('DELETE FROM recipients WHERE eventId = ?', event_ids)
+            self.connection.executemany('INSERT INTO actions VALUES (?, ?, ?, ?, ?)', actions)
+            self.connection.executemany('INSERT OR IGNORE INTO recipients VALUES (?, ?)', recipients)
+        return len(rows)
+
+    def query(self, since=None, until=None, min_severity=None, saas=None, event_type=None, state=None,
+              sender=None, recipient=None, action_type=None, limit=None):
+        """
+        Yields stored events (as returned by the API) matching every given filter, oldest first.
+        since/until compare against eventCreated, so ISO dates and timestamps both work.
+        """
+        clauses, params = [], []
+        for clause, value in (('e.eventCreated >= ?', since), ('e.eventCreated < ?', until),
+                              ('e.severity >= ?', min_severity), ('e.saas = ?', saas), ('e.type = ?', event_type),
+                              ('e.state = ?', state), ('e.senderAddress = ?', sender)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        if recipient is not None:
+            clauses.append('e.eventId IN (SELECT eventId FROM recipients WHERE address = ?)')
+            params.append(recipient)
+        if action_type is not None:
+            clauses.append('e.eventId IN (SELECT eventId FROM actions WHERE actionType = ?)')
+            params.append(action_type)
+        sql = 'SELECT e.event FROM events e'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY e.eventCreated'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        for (event,) in self.connection.execute(sql, params):
+            yield json.loads(event)
+
+def save_to_sqlite(log_data, db_path, host, buffer_size):
+    flattener = EventFlattener(host)
+    written = 0
+    with EventStore(db_path) as store:
+        # The query CLI uses the host to rewrite entity links on export like the live sinks do
+        if store.get_meta('host') != host:
+            with store.connection:
+                store.set_meta('host', host)
+        for batch in iter_batches(log_data, buffer_size):
+            written += store.upsert(batch, flattener)
+    print(f"{written} events stored in {db_path}")
+
+# RFC 5424 forwarder to a remote collector over UDP, TCP (octet-counting framing) or TLS.
+# Keeps one connection open across cycles and reconnects once per failed batch.
+class SyslogForwarder:
+    # HEC severity (1 lowest .. 5 highest) to syslog severity
+    SEVERITY_LEVELS = {'5': 2, '4': 3, '3': 4, '2': 5, '1': 6}
+
+    def __init__(self, host: str, port: int = None, protocol: str = 'udp', ca_file: str = None,
+                 app_name: str = 'hec-log-retrieval', batch_size: int = SYSLOG_BATCH_SIZE):
+        self.host = host
+        self.protocol = protocol
+        self.port = port or (6514 if protocol == 'tls' else 514)
+        self.ca_file = ca_file
+        self.app_name = app_name
+        self.batch_size = batch_size
+        self.hostname = socket.gethostname() or '-'
+        self.procid = str(os.getpid())
+        self.sock = None
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.reconnects = 0
+
+    def _connect(self):
+        if self.protocol == 'udp':
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.connect((self.host, self.port))
+            return
+        sock = socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.protocol == 'tls':
+            context = ssl.create_default_context(cafile=self.ca_file)
+            sock = context.wrap_socket(sock, server_hostname=self.host)
+        sock.settimeout(READ_TIMEOUT)
+        self.sock = sock
 
-        print(f"Batch of {buffer_size} events appended to {file_path}")
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
 
-# Function to send logs to syslog (no change needed for scalability here)
-def save_to_syslog(log_data):
+    @staticmethod
+    def _sd_value(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(']', '\\]')
+
+    def format(self, event):
+        severity = self.SEVERITY_LEVELS.get(str(event.get('severity')), 6)
+        timestamp = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        msgid = str(event.get('type') or '-').replace(' ', '_')[:32]
+        structured = (f'[hec@32473 eventId="{self._sd_value(event.get("eventId", ""))}"'
+                      f' saas="{self._sd_value(event.get("saas", ""))}"'
+                      f' severity="{self._sd_value(event.get("severity", ""))}"'
+                      + (f' changeType="{self._sd_value(event["changeType"])}"' if 'changeType' in event else '')
+                      + ']')
+        header = f"<{SYSLOG_FACILITY * 8 + severity}>1 {timestamp} {self.hostname} {self.app_name} {self.procid} {msgid} {structured} "
+        return header.encode('utf-8') + dumps_line(event).rstrip(b'\n')
+
+    def _peer_closed(self):
+        # Without this check the first batch after a collector restart would be accepted by
+        # the kernel into the dead connection and silently lost. A readable socket is not
+        # enough: TLS 1.3 servers send session tickets after the handshake, so only a
+        # non-blocking read returning EOF or failing with a reset counts. Anything else the
+        # collector wrote is drained so closing later doesn't answer it with a reset.
+        self.sock.setblocking(False)
+        try:
+            while True:
+                if not self.sock.recv(65536):
+                    return True
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        except OSError:
+            return True
+        finally:
+            self.sock.settimeout(READ_TIMEOUT)
+
+    def _send_batch(self, messages):
+        if self.sock is not None and self.protocol != 'udp' and self._peer_closed():
+            self.close()
+            self.reconnects += 1
+        if self.sock is None:
+            self._connect()
+        if self.protocol == 'udp':
+            for message in messages:
+                self.sock.send(message[:SYSLOG_MAX_DATAGRAM])
+        else:
+            # RFC 6587 octet counting: "<length> <message>", so messages may contain newlines
+            self.sock.sendall(b''.join(b'%d %s' % (len(message), message) for message in messages))
+
+    def send(self, events):
+        started = time()
+        sent = 0
+        for batch in iter_batches(events, self.batch_size):
+            messages = [self.format(event) for event in batch]
+            try:
+                self._send_batch(messages)
+            except OSError:
+                # Collector restarted or the connection went stale: reconnect and retry the batch once
+                self.close()
+                self.reconnects += 1
+                self._send_batch(messages)
+            sent += len(messages)
+            self.messages_sent += len(messages)
+            self.bytes_sent += sum(len(message) for message in messages)
+        elapsed = max(time() - started, 1e-6)
+        print(f"{sent} events forwarded to {self.protocol}://{self.host}:{self.port} "
+              f"({sent / elapsed:,.0f} msg/s, {self.messages_sent} total, {self.reconnects} reconnects)")
+
+# Function to send logs to syslog: the remote forwarder when configured, else the local daemon
+def save_to_syslog(log_data, forwarder: SyslogForwarder = None):
+    if forwarder is not None:
+        forwarder.send(log_data)
+        return
+    if syslog is None:
+        raise RuntimeError("Local syslog is not available on this platform, use --syslog-host")
     for event in log_data:
         message = f"Event ID: {event.get('eventId')}, Data: {json.dumps(event)}"
         syslog.syslog(syslog.LOG_INFO, message)
     print("Logs sent to syslog")
 
-def main():
-    # Set up argument parser
-    parser = argparse.ArgumentParser(description='Fetch events from Harmony API and log them.')
-    parser.add_argument('--client-id', required=True, help='Your Client ID')
-    parser.add_argument('--access-key', required=True, help='Your Access Key')
-    parser.add_argument('--host', required=True, help='API Host (e.g., cloudinfra-gw-us.portal.checkpoint.com)')
-    parser.add_argument('--file-type', choices=['txt', 'csv', 'syslog'], required=True, help='Choose file type for log output')
-    parser.add_argument('--output-file', required=False, help='File path to save logs (required for txt/csv output)')
-    args = parser.parse_args()
+# Rotates an append-only output file by size and/or age. The writers open, append and
+# close the file on every call, so renaming it between calls never races with a write,
+# and the CSV header is re-emitted because the next write finds an empty file.
+class OutputRotator:
+    def __init__(self, file_path: str, max_bytes: int = 0, interval: float = 0,
+                 compress: str = 'gzip', keep: int = ROTATE_KEEP):
+        if compress == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package: pip install zstandard")
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compress = None if compress == 'none' else compress
+        self.keep = keep
+        self.opened_at = time()
+        # A single background worker, so compression never stalls the poll loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rotate')
+        directory, name = os.path.split(os.path.abspath(file_path))
+        self.directory = directory
+        self.segment_pattern = re.compile(re.escape(name) + r'\.(\d{8}T\d{6})(?:-(\d+))?(\.gz|\.zst)?$')
 
-    # Create the API client with command-line arguments
-    client = ApiClient(args.client_id, args.access_key, args.host)
+    def should_rotate(self):
+        try:
+            size = os.path.getsize(self.file_path)
+        except FileNotFoundError:
+            return False
+        if size == 0:
+            return False
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.interval) and time() - self.opened_at >= self.interval
 
-    # Check if output file is needed (txt/csv)
-    if args.file_type in ['txt', 'csv'] and not args.output_file:
-        raise ValueError("You must provide an output file path for txt or csv file type.")
+    def maybe_rotate(self):
+        """
+        Closes the current segment if it is too big or too old. Call before each write.
+        """
+        if not self.should_rotate():
+            return None
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+        segment = f"{self.file_path}.{stamp}"
+        suffix = 1
+        while os.path.exists(segment) or os.path.exists(f"{segment}.gz") or os.path.exists(f"{segment}.zst"):
+            segment = f"{self.file_path}.{stamp}-{suffix}"
+            suffix += 1
+        os.replace(self.file_path, segment)
+        self.opened_at = time()
+        self.executor.submit(self._finish_segment, segment)
+        return segment
 
-    # Continuously run every 5 minutes
-    while True:
-        end_time = datetime.utcnow()
-        start_time = end_time - timedelta(minutes=5)
+    def _finish_segment(self, segment):
+        try:
+            if self.compress:
+                self._compress(segment)
+            self._prune()
+        except Exception as e:
+            logging.error(f"Failed to compress or prune {segment}: {e}")
+
+    def _compress(self, segment):
+        extension = '.gz' if self.compress == 'gzip' else '.zst'
+        temp_file = f"{segment}{extension}.tmp"
+        with open(segment, 'rb') as source:
+            if self.compress == 'gzip':
+                with gzip.open(temp_file, 'wb', compresslevel=6) as target:
+                    shutil.copyfileobj(source, target, WRITE_BUFFER_SIZE)
+            else:
+                with open(temp_file, 'wb') as target:
+                    zstandard.ZstdCompressor(level=3).copy_stream(source, target)
+        os.replace(temp_file, f"{segment}{extension}")
+        os.remove(segment)
+
+    def _prune(self):
+        if not self.keep:
+            return
+        # Oldest first by (timestamp, collision suffix): by name, "...T000000-1.gz" would sort
+        # before the older "...T000000.gz"
+        segments = []
+        for name in os.listdir(self.directory):
+            match = self.segment_pattern.match(name)
+            if match:
+                segments.append((match.group(1), int(match.group(2) or 0), name))
+        for _, _, name in sorted(segments)[:-self.keep]:
+            os.remove(os.path.join(self.directory, name))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+# Pushes events to an HTTP event collector (Splunk HEC-style endpoint or a generic webhook) as
+# gzip-compressed NDJSON bodies. Events are packed into batches by count, bytes and linger time
+# and uploaded by a small pool of threads over keep-alive connections; 429/5xx and connection
+# errors are retried with backoff. send() returns once every batch it produced is acknowledged.
+class HttpCollector:
+    def __init__(self, url: str, token: str = None, auth_scheme: str = 'Bearer', event_format: str = 'ndjson',
+                 host: str = '', batch_events: int = HTTP_BATCH_EVENTS, batch_bytes: int = HTTP_BATCH_BYTES,
+                 linger: float = HTTP_LINGER, concurrency: int = HTTP_CONCURRENCY, max_retries: int = MAX_RETRIES,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), fields=None):
+        self.url = url
+        self.event_format = event_format
+        self.host = host
+        self.fields = fields
+        self.batch_events = batch_events
+        self.batch_bytes = batch_bytes
+        self.linger = linger
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = create_session(concurrency)
+        self.session.headers['Content-Type'] = 'application/x-ndjson'
+        self.session.headers['Content-Encoding'] = 'gzip'
+        if token:
+            self.session.headers['Authorization'] = f'{auth_scheme} {token}'
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='http-sink')
+        # Bounds queued bodies, so a slow collector slows the caller instead of filling memory
+        self.slots = threading.BoundedSemaphore(concurrency * 2)
+        self.lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.batch = []
+        self.batch_size = 0
+        self.batch_started = None
+        self.uploads = []
+        self.events_sent = 0
+        self.bytes_sent = 0
+        self.requests_sent = 0
+        self.retries = 0
+        self.closed = threading.Event()
+        threading.Thread(target=self._linger_loop, name='http-linger', daemon=True).start()
+
+    def encode(self, event):
+        if self.fields:
+            event = project_event(event, self.fields)
+        if 'entityLink' in event:
+            event['entityLink'] = adjust_entity_link(event['entityLink'], self.host)
+        if self.event_format == 'splunk':
+            created = parse_event_time(event.get('eventCreated'))
+            wrapper = {'event': event, 'sourcetype': 'checkpoint:hec', 'source': 'hec-log-retrieval'}
+            if created:
+                wrapper['time'] = round(created.timestamp(), 3)
+            event = wrapper
+        return dumps_line(event)
+
+    def send(self, events):
+        for event in events:
+            line = self.encode(event)
+            with self.lock:
+                if not self.batch:
+                    self.batch_started = monotonic()
+                self.batch.append(line)
+                self.batch_size += len(line)
+                if len(self.batch) >= self.batch_events or self.batch_size >= self.batch_bytes:
+                    self._flush_locked()
+        self.flush()
+
+    def flush(self):
+        """
+        Sends the partial batch and waits for every upload started so far; raises the first failure.
+        """
+        with self.lock:
+            self._flush_locked()
+            uploads, self.uploads = self.uploads, []
+        errors = [upload.exception() for upload in uploads]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def _flush_locked(self):
+        if not self.batch:
+            return
+        body, count = b''.join(self.batch), len(self.batch)
+        self.batch = []
+        self.batch_size = 0
+        self.slots.acquire()
+        upload = self.pool.submit(self._upload, body, count)
+        upload.add_done_callback(lambda _: self.slots.release())
+        self.uploads.append(upload)
+
+    def _linger_loop(self):
+        while not self.closed.wait(self.linger / 4):
+            with self.lock:
+                if self.batch and monotonic() - self.batch_started >= self.linger:
+                    self._flush_locked()
+
+    def _upload(self, body, count):
+        compressed = gzip.compress(body, compresslevel=5)
+        for attempt in range(self.max_retries + 1):
+            try:
+                res = self.session.post(self.url, data=compressed, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                if res.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    res.raise_for_status()
+                    break
+                delay = retry_after_delay(res) or backoff_delay(attempt)
+            with self.stats_lock:
+                self.retries += 1
+            sleep(delay)
+        # Not self.lock: a flush holds it while waiting for a free upload slot
+        with self.stats_lock:
+            self.events_sent += count
+            self.bytes_sent += len(compressed)
+            self.requests_sent += 1
+
+    def stats(self):
+        return (f"{self.events_sent} events in {self.requests_sent} requests, {self.bytes_sent} bytes compressed, "
+                f"{self.retries} retries")
+
+    def close(self):
+        self.closed.set()
+        try:
+            self.flush()
+        finally:
+            self.pool.shutdown(wait=True)
+            self.session.close()
+
+def parse_event_time(value):
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+def save_to_http(log_data, collector: HttpCollector):
+    sent_before = collector.events_sent
+    collector.send(log_data)
+    print(f"{collector.events_sent - sent_before} events sent to {collector.url}")
+
+def load_watermark(state_file):
+    try:
+        with open(state_file) as file:
+            state = json.load(file)
+    except FileNotFoundError:
+        return None
+    return datetime.strptime(state['endDate'], DATE_FORMAT).replace(tzinfo=timezone.utc)
+
+# Write the state file atomically so a crash mid-write never leaves a corrupt watermark
+def save_watermark(state_file, end_time):
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, 'w') as file:
+        json.dump({'endDate': end_time.strftime(DATE_FORMAT)}, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, state_file)
+
+# Hands out contiguous query windows that start where the last successful write ended
+class WatermarkScheduler:
+    def __init__(self, state_file: str = None, interval: float = POLL_INTERVAL,
+                 safety_lag: float = SAFETY_LAG, max_window: float = MAX_CATCHUP_WINDOW):
+        self.state_file = state_file
+        self.interval = timedelta(seconds=interval)
+        self.safety_lag = timedelta(seconds=safety_lag)
+        self.max_window = timedelta(seconds=max_window)
+        self.watermark = load_watermark(state_file) if state_file else None
+
+    def next_window(self, now: datetime = None):
+        """
+        Returns the (start, end) datetimes to query next, or None if there is nothing new yet.
+        """
+        # Whole seconds only, so the persisted watermark is exactly what was queried
+        limit = (now or datetime.now(timezone.utc)).replace(microsecond=0) - self.safety_lag
+        # Without a watermark (first run, no state file) start one interval back
+        start = self.watermark or limit - self.interval
+        end = min(limit, start + self.max_window)
+        if end <= start:
+            return None
+        return start, end
+
+    def commit(self, end: datetime):
+        self.watermark = end
+        if self.state_file:
+            save_watermark(self.state_file, end)
+
+    def is_behind(self, now: datetime = None):
+        limit = (now or datetime.now(timezone.utc)) - self.safety_lag
+        return self.watermark is not None and limit - self.watermark > self.interval
+
+    def record(self, events: int, pages: int):
+        """
+        Feedback from the last window; the fixed scheduler ignores it.
+        """
+
+    def poll_interval(self):
+        return self.interval.total_seconds()
+
+# Sizes each window from the volume of the previous one: busy tenants get small, frequent
+# windows (small responses, low latency), quiet tenants get wide ones (fewer API calls)
+class AdaptiveScheduler(WatermarkScheduler):
+    def __init__(self, state_file: str = None, safety_lag: float = SAFETY_LAG,
+                 min_window: float = MIN_WINDOW, max_window: float = MAX_WINDOW,
+                 target_events: int = TARGET_EVENTS, max_pages: int = MAX_PAGES,
+                 initial_window: float = POLL_INTERVAL):
+        super().__init__(state_file, initial_window, safety_lag, max_window)
+        self.min_window = timedelta(seconds=min_window)
+        self.target_events = target_events
+        self.max_pages = max_pages
+        self.interval = min(max(self.interval, self.min_window), self.max_window)
+
+    def next_window(self, now: datetime = None):
+        limit = (now or datetime.now(timezone.utc)).replace(microsecond=0) - self.safety_lag
+        start = self.watermark or limit - self.interval
+        end = min(limit, start + self.interval)
+        if end <= start:
+            return None
+        return start, end
+
+    def record(self, events: int, pages: int):
+        if events > self.target_events or pages > self.max_pages:
+            self.interval = max(self.min_window, self.interval / 2)
+        elif events == 0:
+            self.interval = min(self.max_window, self.interval * 2)
+        elif events < self.target_events / 4:
+            self.interval = min(self.max_window, self.interval * 1.5)
+        # Keep whole seconds so windows line up with the persisted watermark
+        self.interval = timedelta(seconds=round(self.interval.total_seconds()))
+
+# Drops events already emitted in an earlier (or overlapping) window.
+# Keys live in an LRU-ordered dict, so lookups and evictions are O(1) per event.
+class EventDeduplicator:
+    def __init__(self, capacity: int = DEDUP_CAPACITY, index_file: str = None, content_hash: bool = False):
+        self.capacity = capacity
+        self.index_file = index_file
+        self.content_hash = content_hash
+        self.recent = OrderedDict()  # eventId -> content digest ('' when hashing is off)
+        self.pending = []  # Keys accepted this cycle, persisted on commit()
+        self.passed = 0
+        self.duplicates = 0
+        self.index_lines = 0  # Lines in the index file, compacted once it passes 2x capacity
+        if index_file:
+            self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_file) as file:
+                lines = deque(file, maxlen=self.capacity)
+        except FileNotFoundError:
+            return
+        for line in lines:
+            event_id, _, digest = line.rstrip('\n').partition('\t')
+            self._remember(event_id, digest)
+        # Compact the index so it never holds more than the in-memory window
+        self._rewrite_index()
+
+    def _rewrite_index(self):
+        temp_file = f"{self.index_file}.tmp"
+        with open(temp_file, 'w') as file:
+            file.writelines(f"{event_id}\t{digest}\n" for event_id, digest in self.recent.items())
+        os.replace(temp_file, self.index_file)
+        self.index_lines = len(self.recent)
+
+    def _remember(self, event_id, digest):
+        self.recent[event_id] = digest
+        self.recent.move_to_end(event_id)
+        if len(self.recent) > self.capacity:
+            self.recent.popitem(last=False)
+
+    def _digest(self, event):
+        if not self.content_hash:
+            return ''
+        content = json.dumps(event, sort_keys=True, separators=(',', ':')).encode()
+        return hashlib.blake2b(content, digest_size=8).hexdigest()
+
+    def is_duplicate(self, event):
+        event_id = event.get('eventId')
+        if event_id is None:
+            return False
+        event_id = str(event_id)
+        digest = self._digest(event)
+        # With content hashing, an event whose content changed is emitted again
+        if event_id in self.recent and self.recent[event_id] == digest:
+            self.recent.move_to_end(event_id)
+            return True
+        self.pending.append((event_id, self.recent.get(event_id)))
+        self._remember(event_id, digest)
+        return False
+
+    def filter(self, events):
+        for event in events:
+            if self.is_duplicate(event):
+                self.duplicates += 1
+            else:
+                self.passed += 1
+                yield event
 
-        start_date = start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-        end_date = end_time.strftime('%Y-%m-%dT%H:%M:%SZ')
+    def commit(self):
+        """
+        Persists the keys accepted since the last commit; call once the events are written.
+        """
+        if self.index_file and self.pending:
+            lines = [f"{event_id}\t{self.recent.get(event_id, '')}\n"
+                     for event_id, _ in self.pending if event_id in self.recent]
+            with open(self.index_file, 'a') as file:
+                file.writelines(lines)
+            self.index_lines += len(lines)
+            # Appends only ever grow the file; rewrite it from memory before restarts get slow
+            if self.index_lines > 2 * self.capacity:
+                self._rewrite_index()
+        self.pending = []
 
-        print(f"Querying events from {start_date} to {end_date}...")
+    def discard(self):
+        """
+        Forgets the keys accepted since the last commit, so a failed window can be retried.
+        """
+        for event_id, previous in reversed(self.pending):
+            if previous is None:
+                self.recent.pop(event_id, None)
+            else:
+                self.recent[event_id] = previous
+        self.pending = []
+
+    def stats(self):
+        return f"{self.duplicates} duplicate events dropped, {self.passed} passed, {len(self.recent)} ids tracked"
+
+# Incremental mode: keeps a compact fingerprint per eventId (state, action count and a digest
+# of the actions) and lets through only events that are new or changed since they were last
+# seen, tagged changeType 'created' or 'updated'. An updated event carries only the actions
+# appended since, so sinks emit just the new action rows. Shares the deduplicator's bounded
+# memory, TSV index and commit/discard handling. Every window re-reads the whole lookback, so
+# the tracker must hold at least that many fingerprints or it evicts them in scan order and
+# reports the same events as created on every cycle; end_window() grows it when that happens.
+class ChangeTracker(EventDeduplicator):
+    def __init__(self, capacity: int = DEDUP_CAPACITY, index_file: str = None):
+        super().__init__(capacity, index_file)
+        self.created = 0
+        self.updated = 0
+        self.window_events = 0  # Events seen in the current window, lookback included
+
+    @staticmethod
+    def _hash(value, size):
+        content = json.dumps(value, sort_keys=True, separators=(',', ':')).encode()
+        return hashlib.blake2b(content, digest_size=size).hexdigest()
+
+    def fingerprint(self, event):
+        actions = event.get('actions') or []
+        return f"{self._hash(event.get('state'), 4)}:{len(actions)}:{self._hash(actions, 8)}"
+
+    def changes(self, event):
+        """
+        Returns the record to emit for this event, or None when nothing changed.
+        """
+        event_id = event.get('eventId')
+        if event_id is None:
+            return {**event, 'changeType': 'created'}
+        event_id = str(event_id)
+        self.window_events += 1
+        fingerprint = self.fingerprint(event)
+        previous = self.recent.get(event_id)
+        if previous == fingerprint:
+            self.recent.move_to_end(event_id)
+            return None
+        self.pending.append((event_id, previous))
+        self._remember(event_id, fingerprint)
+        if not previous:
+            self.created += 1
+            return {**event, 'changeType': 'created'}
+
+        self.updated += 1
+        actions = event.get('actions') or []
+        _, _, seen = previous.partition(':')
+        seen_count, _, seen_digest = seen.partition(':')
+        seen_count = int(seen_count or 0)
+        # Actions are appended; if the ones already emitted are unchanged, send only the rest
+        if len(actions) >= seen_count and self._hash(actions[:seen_count], 8) == seen_digest:
+            actions = actions[seen_count:]
+        return {**event, 'actions': actions, 'changeType': 'updated'}
+
+    def filter(self, events):
+        for event in events:
+            record = self.changes(event)
+            if record is None:
+                self.duplicates += 1
+            else:
+                self.passed += 1
+                yield record
+
+    def end_window(self):
+        """
+        Call once a whole window is written. Returns the new capacity if the window held more
+        events than the tracker remembers and it had to grow, otherwise None.
+        """
+        seen, self.window_events = self.window_events, 0
+        if seen <= self.capacity:
+            return None
+        self.capacity = seen * 2
+        return self.capacity
+
+    def discard(self):
+        super().discard()
+        self.window_events = 0
+
+    def stats(self):
+        return (f"{self.created} created, {self.updated} updated, {self.duplicates} unchanged events dropped, "
+                f"{len(self.recent)} ids tracked")
+
+# Write-ahead spool between fetching and the sinks. Pages are appended as NDJSON lines to
+# numbered segment files, with one fsync per page; each sink keeps its own committed offset
+# (segment, byte), so after a sink outage or a restart delivery resumes from disk instead of
+# re-querying the API. Fully delivered segments are deleted, and beyond max_bytes the oldest
+# segments are dropped even if undelivered.
+class EventSpool:
+    OFFSETS_FILE = 'offsets.json'
+
+    def __init__(self, directory: str, sinks=(), segment_bytes: int = SPOOL_SEGMENT_BYTES,
+                 max_bytes: int = SPOOL_MAX_BYTES, sync: bool = True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sinks = list(sinks)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.sync = sync
+        self.lock = threading.Lock()
+        self.appended = threading.Condition(self.lock)
+        self.dropped_bytes = 0
+
+        try:
+            with open(os.path.join(directory, self.OFFSETS_FILE)) as file:
+                self.offsets = {sink: tuple(position) for sink, position in json.load(file).items()}
+        except FileNotFoundError:
+            self.offsets = {}
+        except ValueError:
+            # Empty or torn offsets file: replaying from the oldest segment is still at-least-once
+            print(f"Unreadable {self.OFFSETS_FILE} in {directory}: every sink replays the spool from its oldest segment")
+            self.offsets = {}
+        self.sizes = {}
+        for name in os.listdir(directory):
+            if name.startswith('segment-') and name.endswith('.ndjson'):
+                self.sizes[int(name[8:-7])] = os.path.getsize(os.path.join(directory, name))
+        if not self.sizes:
+            self.sizes[1] = 0
+        self.current = max(self.sizes)
+        self.file = open(self._path(self.current), 'ab')
+        self._trim_torn_line()
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:012d}.ndjson")
+
+    def _trim_torn_line(self):
+        # A crash mid-append can leave a partial last line; drop it, it was never acknowledged
+        size = end = self.sizes[self.current]
+        with open(self._path(self.current), 'rb') as file:
+            while end > 0:
+                step = min(65536, end)
+                file.seek(end - step)
+                newline = file.read(step).rfind(b'\n')
+                if newline >= 0:
+                    end = end - step + newline + 1
+                    break
+                end -= step
+        if end != size:
+            self.file.truncate(end)
+            self.sizes[self.current] = end
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def append(self, events):
+        """
+        Appends one page of events and returns once it is on disk.
+        """
+        data = b''.join(map(dumps_line, events))
+        if not data:
+            return
+        with self.lock:
+            if self.sizes[self.current] and self.sizes[self.current] + len(data) > self.segment_bytes:
+                self.file.close()
+                self.current += 1
+                self.sizes[self.current] = 0
+                self.file = open(self._path(self.current), 'ab')
+            self.file.write(data)
+            self.file.flush()
+            if self.sync:
+                os.fsync(self.file.fileno())
+            self.sizes[self.current] += len(data)
+            self._enforce_limit()
+            self.appended.notify_all()
+
+    def _enforce_limit(self):
+        while len(self.sizes) > 1 and sum(self.sizes.values()) > self.max_bytes:
+            oldest = min(self.sizes)
+            size = self.sizes.pop(oldest)
+            os.remove(self._path(oldest))
+            self.dropped_bytes += size
+            METRICS.inc('hec_spool_dropped_bytes_total', size)
+            print(f"Spool over {self.max_bytes} bytes: dropped undelivered segment {oldest} ({size} bytes)")
+
+    def _position(self, sink):
+        # Offsets into segments that were dropped continue at the oldest remaining one
+        segment, offset = self.offsets.get(sink, (min(self.sizes), 0))
+        if segment < min(self.sizes):
+            return min(self.sizes), 0
+        return segment, offset
+
+    def _end(self):
+        return self.current, self.sizes[self.current]
+
+    def backlog(self, sink):
+        with self.lock:
+            segment, offset = self._position(sink)
+            return sum(size for number, size in self.sizes.items() if number >= segment) - offset
+
+    def wait(self, sink, timeout):
+        """
+        Blocks until the sink has undelivered events, or the timeout passes.
+        """
+        with self.lock:
+            self.appended.wait_for(lambda: self._position(sink) < self._end(), timeout)
+
+    def read(self, sink, max_events: int = SPOOL_DELIVERY_BATCH):
+        """
+        Returns up to max_events events after the sink's committed offset, and the position to
+        commit once they are delivered.
+        """
+        with self.lock:
+            segment, offset = self._position(sink)
+            end_segment, end_offset = self._end()
+            segments = sorted(number for number in self.sizes if segment <= number <= end_segment)
+        events = []
+        position = (segment, offset)
+        for number in segments:
+            if number != segment:
+                offset = 0
+            limit = end_offset if number == end_segment else None
+            try:
+                file = open(self._path(number), 'rb')
+            except FileNotFoundError:  # Dropped while reading
+                continue
+            with file:
+                file.seek(offset)
+                while len(events) < max_events and (limit is None or file.tell() < limit):
+                    line = file.readline()
+                    if not line.endswith(b'\n'):
+                        break
+                    events.append(json.loads(line))
+                position = (number, file.tell())
+            if len(events) >= max_events:
+                break
+        return events, position
+
+    def commit(self, sink, position):
+        with self.lock:
+            self.offsets[sink] = tuple(position)
+            temp_file = os.path.join(self.directory, f"{self.OFFSETS_FILE}.tmp")
+            with open(temp_file, 'w') as file:
+                json.dump(self.offsets, file)
+                file.flush()
+                if self.sync:
+                    os.fsync(file.fileno())
+            os.replace(temp_file, os.path.join(self.directory, self.OFFSETS_FILE))
+            # Segments every sink has moved past are no longer needed
+            delivered = min(self._position(name)[0] for name in self.sinks or [sink])
+            for number in [number for number in self.sizes if number < delivered]:
+                del self.sizes[number]
+                os.remove(self._path(number))
+
+# Save logs based on the file type
+# Counts events as the writer consumes them, so the stream is never materialised
+def count_events(events, labels):
+    for event in events:
+        METRICS.inc('hec_events_written_total', **labels)
+        yield event
+
+def output_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+# forwarder is the SyslogForwarder (syslog) or HttpCollector (http) the sink sends through
+def write_events(args, events, forwarder=None, metric_labels: dict = None):
+    labels = {'sink': args.file_type, **(metric_labels or {})}
+    events = count_events(events, labels)
+    depth = getattr(args, 'pipeline_depth', 0)
+    fields = getattr(args, 'fields', None)
+    if args.file_type in ['txt', 'csv', 'ndjson']:
+        size_before = output_size(args.output_file)
+    if args.file_type == 'txt':
+        save_to_txt(events, args.output_file, buffer_size=BATCH_SIZE, pipeline_depth=depth, fields=fields)
+    elif args.file_type == 'csv':
+        save_to_csv(events, args.output_file, args.host, buffer_size=BATCH_SIZE, pipeline_depth=depth,
+                    tag_changes=getattr(args, 'incremental', False), fields=fields)
+    elif args.file_type == 'ndjson':
+        save_to_ndjson(events, args.output_file, args.host, buffer_size=BATCH_SIZE, pipeline_depth=depth,
+                       fields=fields)
+    elif args.file_type == 'parquet':
+        METRICS.inc('hec_bytes_written_total', save_to_parquet(events, args.output_file, args.host, args.row_group_size), **labels)
+    elif args.file_type == 'sqlite':
+        size_before = output_size(args.output_file)
+        save_to_sqlite(events, args.output_file, args.host, buffer_size=SQLITE_BATCH_SIZE)
+        METRICS.inc('hec_bytes_written_total', max(output_size(args.output_file) - size_before, 0), **labels)
+    elif args.file_type == 'http':
+        bytes_before = forwarder.bytes_sent
+        save_to_http(events, forwarder)
+        METRICS.inc('hec_bytes_written_total', forwarder.bytes_sent - bytes_before, **labels)
+    elif args.file_type == 'syslog':
+        bytes_before = forwarder.bytes_sent if forwarder else 0
+        save_to_syslog(events, forwarder)
+        if forwarder:
+            METRICS.inc('hec_bytes_written_total', forwarder.bytes_sent - bytes_before, **labels)
+    if args.file_type in ['txt', 'csv', 'ndjson']:
+        METRICS.inc('hec_bytes_written_total', max(output_size(args.output_file) - size_before, 0), **labels)
+
+# requestData filters from the options; the API matches any of the values given per field
+def event_filters(args):
+    filters = {}
+    for key, option in (('severities', 'severities'), ('saas', 'saas'), ('eventTypes', 'event_types'),
+                        ('eventStates', 'event_states')):
+        values = getattr(args, option, None)
+        if isinstance(values, str):  # A single value in a --config file
+            values = [values]
+        if values:
+            filters[key] = [str(value) for value in values]
+    return filters
+
+# One client-id/host pair with its own credentials, sinks, scheduler and deduplication index.
+# A turn fetches at most page_budget pages, so in multi-tenant mode a large tenant hands the
+# worker back mid-window instead of starving the others; the watermark only moves once the
+# whole window has been written.
+class TenantPoller:
+    def __init__(self, args, name: str = None):
+        self.args = args
+        self.name = name
+        self.prefix = f"[{name}] " if name else ''
+        self.metric_labels = {'tenant': name} if name else {}
+
+        if isinstance(args.fields, str):
+            args.fields = [args.fields]
+        unknown = set(args.fields or []) - set(FIELD_NAMES)
+        if unknown:
+            raise ValueError(f"{self.prefix}Unknown --fields: {', '.join(sorted(unknown))}")
+        if args.fields and args.file_type not in ['txt', 'csv', 'ndjson', 'http']:
+            raise ValueError(f"{self.prefix}--fields applies to txt, csv, ndjson and http output")
+
+        # Check if output file is needed (txt/csv/ndjson/parquet)
+        if args.file_type in ['txt', 'csv', 'ndjson', 'parquet', 'sqlite'] and not args.output_file:
+            raise ValueError(f"{self.prefix}You must provide an output file path for txt, csv, ndjson, parquet or sqlite file type.")
+
+        self.client = ApiClient(args.client_id, args.access_key, args.host, pool_size=args.pool_size,
+                                connect_timeout=args.connect_timeout, read_timeout=args.read_timeout,
+                                max_retries=args.max_retries, rate_limit=args.rate_limit, rate_burst=args.rate_burst,
+                                metric_labels=self.metric_labels, token_cache=args.token_cache, token_skew=args.token_skew)
+
+        if args.adaptive:
+            self.scheduler = AdaptiveScheduler(args.state_file, args.safety_lag, args.min_window, args.max_window,
+                                               args.target_events, args.max_pages, args.interval)
+        else:
+            self.scheduler = WatermarkScheduler(args.state_file, args.interval, args.safety_lag, args.max_catchup)
+
+        self.forwarder = None
+        if args.file_type == 'syslog' and args.syslog_host:
+            self.forwarder = SyslogForwarder(args.syslog_host, args.syslog_port, args.syslog_protocol, args.syslog_ca_file)
+        elif args.file_type == 'http':
+            if not args.http_url:
+                raise ValueError(f"{self.prefix}You must provide --http-url for http file type.")
+            self.forwarder = HttpCollector(args.http_url, args.http_token, args.http_auth_scheme, args.http_format,
+                                           args.host, args.http_batch_events, int(args.http_batch_kb * 1024),
+                                           args.http_linger, args.http_concurrency, args.max_retries,
+                                           fields=args.fields)
+
+        self.rotator = None
+        if args.file_type in ['txt', 'csv', 'ndjson'] and (args.rotate_size_mb or args.rotate_interval):
+            self.rotator = OutputRotator(args.output_file, int(args.rotate_size_mb * 1024 * 1024), args.rotate_interval,
+                                         args.rotate_compress, args.rotate_keep)
+
+        self.deduplicator = None
+        if args.incremental:
+            if args.file_type in ['parquet', 'sqlite'] or args.dedup or args.adaptive:
+                raise ValueError(f"{self.prefix}--incremental works with txt, csv, ndjson and syslog output, "
+                                 "without --dedup or --adaptive")
+            self.deduplicator = ChangeTracker(args.dedup_capacity, args.dedup_index)
+        elif args.dedup or args.dedup_index:
+            self.deduplicator = EventDeduplicator(args.dedup_capacity, args.dedup_index, args.dedup_content_hash)
+
+        METRICS.set_function('hec_watermark_lag_seconds',
+                             lambda: (datetime.now(timezone.utc) - self.scheduler.watermark).total_seconds()
+                             if self.scheduler.watermark else None, **self.metric_labels)
+
+        self.filters = event_filters(args)
+
+        self.spool = None
+        if args.spool_dir:
+            self.spool = EventSpool(args.spool_dir, [args.file_type], int(args.spool_segment_mb * 1024 * 1024),
+                                    int(args.spool_max_mb * 1024 * 1024))
+            METRICS.set_function('hec_spool_backlog_bytes', lambda: self.spool.backlog(args.file_type),
+                                 sink=args.file_type, **self.metric_labels)
+            threading.Thread(target=self.deliver, name=f'deliver {name or args.host}', daemon=True).start()
+
+        # Window in progress and its scroll-page iterator, kept across turns
+        self.window = None
+        self.pages = None
+        # Cycles start on a fixed cadence, so query and write time never turn into gaps
+        self.next_run = monotonic()
+
+    def log(self, message):
+        print(f"{self.prefix}{message}")
+
+    def turn(self, page_budget: int = None):
+        """
+        Fetches and writes up to page_budget pages of the current window.
+        Returns True when the tenant should run again right away (more pages, or still catching up).
+        """
+        if self.pages is None:
+            self.window = self.scheduler.next_window()
+            if not self.window:
+                return False
+            start_date = self.window[0].strftime(DATE_FORMAT)
+            end_date = self.window[1].strftime(DATE_FORMAT)
+            if self.args.incremental:
+                # Re-read the trailing lookback; the tracker drops what has not changed
+                start_date = (self.window[0] - timedelta(seconds=self.args.lookback)).strftime(DATE_FORMAT)
+            self.log(f"Querying events from {start_date} to {end_date}...")
+            self.pages = self.client.iter_event_pages(start_date, end_date, self.filters)
+            if self.args.pipeline_depth:
+                # Fetch stage: scroll pages are read ahead while this thread transforms and writes
+                self.pages = pipelined(self.pages, self.args.pipeline_depth, name=f'fetch {self.name or self.args.host}')
 
         try:
-            events = client.query_events(start_date, end_date)
+            # Pages read ahead by the fetch stage are not counted until they are taken here
+            taken = 0
+
+            def take_pages():
+                nonlocal taken
+                for page in islice(self.pages, page_budget) if page_budget else self.pages:
+                    taken += 1
+                    yield page
+
+            if self.spool:
+                # The sink is fed by deliver(); a page only counts as written once it is spooled
+                for page in take_pages():
+                    if self.deduplicator:
+                        page = list(self.deduplicator.filter(page))
+                    self.spool.append(page)
+                events = None
+            else:
+                events = chain.from_iterable(take_pages())
+                if self.deduplicator:
+                    events = self.deduplicator.filter(events)
+
+                # Quiet windows skip the writers entirely
+                events = peek_events(events)
+            if events is None:
+                if self.client.last_query_events == 0:
+                    self.log("No new events in this window, skipping write.")
+            else:
+                if self.rotator:
+                    self.rotator.maybe_rotate()
+                write_events(self.args, events, self.forwarder, self.metric_labels)
+            if self.deduplicator:
+                self.deduplicator.commit()
 
-            # Save logs based on the file type
-            if args.file_type == 'txt':
-                save_to_txt(events, args.output_file, buffer_size=BATCH_SIZE)
-            elif args.file_type == 'csv':
-                save_to_csv(events, args.output_file, args.host, buffer_size=BATCH_SIZE)
-            elif args.file_type == 'syslog':
-                save_to_syslog(events)
+            # A full slice may have stopped right before more pages
+            if page_budget and taken >= page_budget:
+                return True
 
-            print(f"Events successfully logged in {args.file_type} format.")
+            self.scheduler.record(self.client.last_query_events, self.client.last_query_pages)
+            if self.args.incremental:
+                grown = self.deduplicator.end_window()
+                if grown:
+                    self.log(f"Warning: the lookback held more events than --dedup-capacity, so some were "
+                             f"reported as created again; tracking up to {grown} events from now on. "
+                             f"Raise --dedup-capacity or lower --lookback to avoid this after a restart.")
+            # Only advance the watermark once the whole window has been written
+            self.scheduler.commit(self.window[1])
+            self.pages = None
+            METRICS.inc('hec_windows_total', result='success', **self.metric_labels)
+            if self.spool:
+                self.log(f"Events spooled for {self.args.file_type} output, "
+                         f"{self.spool.backlog(self.args.file_type)} bytes awaiting delivery.")
+            else:
+                self.log(f"Events successfully logged in {self.args.file_type} format.")
+            if self.deduplicator:
+                self.log(f"{'Changes' if self.args.incremental else 'Deduplication'}: {self.deduplicator.stats()}")
+            if self.client.retries or self.client.throttled:
+                self.log(f"API: {self.client.retry_stats()}")
         except requests.exceptions.HTTPError as e:
-            print(f"HTTP error occurred: {e}")
+            self.log(f"HTTP error occurred: {e}")
+            return self.fail()
         except Exception as e:
-            print(f"An error occurred: {e}")
+            self.log(f"An error occurred: {e}")
+            return self.fail()
+
+        # After downtime, keep catching up in bounded chunks without waiting
+        return self.scheduler.is_behind()
+
+    def fail(self):
+        # The window is retried from the watermark on the next cycle
+        if self.pages is not None:
+            self.pages.close()
+        self.pages = None
+        if self.deduplicator:
+            self.deduplicator.discard()
+        METRICS.inc('hec_windows_total', result='failed', **self.metric_labels)
+        return False
+
+    def deliver(self):
+        """
+        Drains the spool into the sink on its own thread, so a slow sink never holds up fetching
+        and a failed one is retried from its committed offset.
+        """
+        sink = self.args.file_type
+        while True:
+            self.spool.wait(sink, SPOOL_RETRY_INTERVAL)
+            events, position = self.spool.read(sink)
+            if not events:
+                continue
+            try:
+                if self.rotator:
+                    self.rotator.maybe_rotate()
+                write_events(self.args, events, self.forwarder, self.metric_labels)
+            except Exception as e:
+                self.log(f"Sink error, {len(events)} spooled events will be retried: {e}")
+                sleep(SPOOL_RETRY_INTERVAL)
+                continue
+            self.spool.commit(sink, position)
+
+    def schedule_next(self):
+        self.next_run += self.scheduler.poll_interval()
+        if self.next_run < monotonic():
+            self.next_run = monotonic()
+
+# Shared scheduler for one or more tenants: a heap ordered by due time, drained by a bounded
+# worker pool. A tenant is never run by two workers at once, and one that wants another turn
+# goes behind every tenant already due, which interleaves large tenants fairly.
+def run_pollers(pollers, workers: int = 1, page_budget: int = None, metrics_textfile: str = None):
+    sequence = count()
+    due = [(poller.next_run, next(sequence), poller) for poller in pollers]
+    heapq.heapify(due)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            now = monotonic()
+            while due and len(running) < workers and due[0][0] <= now:
+                _, _, poller = heapq.heappop(due)
+                running[pool.submit(poller.turn, page_budget)] = poller
+
+            timeout = None
+            if due and len(running) < workers:
+                timeout = max(due[0][0] - now, 0)
+            if not running:
+                sleep(timeout)
+                continue
+
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                poller = running.pop(future)
+                try:
+                    again = future.result()
+                except Exception as e:
+                    poller.log(f"An error occurred: {e}")
+                    again = False
+                if again:
+                    heapq.heappush(due, (monotonic(), next(sequence), poller))
+                else:
+                    poller.schedule_next()
+                    heapq.heappush(due, (poller.next_run, next(sequence), poller))
+
+            if metrics_textfile and done:
+                try:
+                    METRICS.write_textfile(metrics_textfile)
+                except OSError as e:
+                    print(f"Could not write metrics file: {e}")
+
+# Settings a tenant entry may override, i.e. every option except the process-wide ones
+GLOBAL_OPTIONS = {'config', 'workers', 'page_budget', 'metrics_port', 'metrics_textfile'}
+
+def load_tenants(config_file, args):
+    """
+    Builds one argparse.Namespace per tenant: command-line values, then the config's
+    "defaults", then the tenant entry. Keys are option names with '_' instead of '-'.
+    """
+    with open(config_file) as file:
+        config = json.load(file)
+    allowed = set(vars(args)) - GLOBAL_OPTIONS
+    defaults = config.get('defaults', {})
+    tenants = []
+    seen_paths = {}
+    for index, tenant in enumerate(config.get('tenants', [])):
+        settings = {**defaults, **tenant}
+        name = settings.pop('name', None) or f"{settings.get('host')}#{index}"
+        unknown = set(settings) - allowed
+        if unknown:
+            raise ValueError(f"Unknown setting(s) for tenant {name}: {', '.join(sorted(unknown))}")
+        tenant_args = argparse.Namespace(**{**vars(args), **settings})
+        missing = [key for key in ('client_id', 'access_key', 'host', 'file_type') if not getattr(tenant_args, key)]
+        if missing:
+            raise ValueError(f"Tenant {name} is missing: {', '.join(missing)}")
+        # Two tenants sharing a state, index or output file would corrupt each other
+        for key in ('state_file', 'dedup_index', 'output_file', 'spool_dir'):
+            path = getattr(tenant_args, key)
+            if path and (key, path) in seen_paths:
+                raise ValueError(f"Tenants {seen_paths[(key, path)]} and {name} share {key} {path}")
+            seen_paths[(key, path)] = name
+        tenants.append((name, tenant_args))
+    if not tenants:
+        raise ValueError(f"No tenants defined in {config_file}")
+    return tenants
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Fetch events from Harmony API and log them.')
+    parser.add_argument('--client-id', required=False, help='Your Client ID')
+    parser.add_argument('--access-key', required=False, help='Your Access Key')
+    parser.add_argument('--host', required=False, help='API Host (e.g., cloudinfra-gw-us.portal.checkpoint.com)')
+    parser.add_argument('--file-type', choices=['txt', 'csv', 'ndjson', 'parquet', 'sqlite', 'syslog', 'http'], required=False, help='Choose file type for log output')
+    parser.add_argument('--output-file', required=False, help='File path to save logs (required for txt/csv/ndjson/sqlite output, a directory for parquet)')
+    parser.add_argument('--row-group-size', type=int, default=PARQUET_ROW_GROUP_SIZE, help='Rows per Parquet row group')
+    parser.add_argument('--pool-size', type=int, default=POOL_SIZE, help='Number of keep-alive connections kept open to the API host')
+    parser.add_argument('--connect-timeout', type=float, default=CONNECT_TIMEOUT, help='Seconds to wait when opening a connection')
+    parser.add_argument('--read-timeout', type=float, default=READ_TIMEOUT, help='Seconds to wait for an API response')
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES, help='Retries for 429/5xx responses and connection errors')
+    parser.add_argument('--rate-limit', type=float, required=False, help='Maximum API requests per second')
+    parser.add_argument('--rate-burst', type=float, required=False, help='Requests allowed in a burst above --rate-limit')
+    parser.add_argument('--token-cache', required=False, help='File (created 0600) that shares bearer tokens across processes and restarts for the same client-id/host')
+    parser.add_argument('--token-skew', type=float, default=TOKEN_REFRESH_SKEW, help='Seconds before expiry a token is refreshed')
+    parser.add_argument('--state-file', required=False, help='File that stores the last written endDate, so restarts resume without gaps')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help='Seconds between polling cycles')
+    parser.add_argument('--safety-lag', type=float, default=SAFETY_LAG, help='Seconds behind now each window ends')
+    parser.add_argument('--max-catchup', type=float, default=MAX_CATCHUP_WINDOW, help='Largest window in seconds queried per cycle while catching up')
+    parser.add_argument('--syslog-host', required=False, help='Forward syslog output to this collector instead of the local daemon')
+    parser.add_argument('--syslog-port', type=int, required=False, help='Collector port (default 514, or 6514 for tls)')
+    parser.add_argument('--syslog-protocol', choices=['udp', 'tcp', 'tls'], default='udp', help='Transport used to reach the syslog collector')
+    parser.add_argument('--syslog-ca-file', required=False, help='CA bundle used to verify a tls collector')
+    parser.add_argument('--http-url', required=False, help='Collector URL for http output, e.g. https://splunk:8088/services/collector/event')
+    parser.add_argument('--http-token', required=False, help='Token sent as "Authorization: <scheme> <token>"')
+    parser.add_argument('--http-auth-scheme', default='Bearer', help='Authorization scheme for --http-token (use Splunk for Splunk HEC)')
+    parser.add_argument('--http-format', choices=['ndjson', 'splunk'], default='ndjson', help='One event per line, or Splunk HEC {"event": ...} envelopes')
+    parser.add_argument('--http-batch-events', type=int, default=HTTP_BATCH_EVENTS, help='Events per request')
+    parser.add_argument('--http-batch-kb', type=float, default=HTTP_BATCH_BYTES / 1024, help='Uncompressed KB per request')
+    parser.add_argument('--http-linger', type=float, default=HTTP_LINGER, help='Seconds a partial batch waits for more events')
+    parser.add_argument('--http-concurrency', type=int, default=HTTP_CONCURRENCY, help='Concurrent uploads')
+    parser.add_argument('--rotate-size-mb', type=float, default=0, help='Start a new output file once it reaches this size')
+    parser.add_argument('--rotate-interval', type=float, default=0, help='Start a new output file after this many seconds')
+    parser.add_argument('--rotate-compress', choices=['gzip', 'zstd', 'none'], default='gzip', help='Compression applied to closed output files')
+    parser.add_argument('--rotate-keep', type=int, default=ROTATE_KEEP, help='Closed output files to keep (0 keeps all)')
+    parser.add_argument('--adaptive', action='store_true', help='Size windows and the polling interval from event volume')
+    parser.add_argument('--min-window', type=float, default=MIN_WINDOW, help='Smallest adaptive window in seconds')
+    parser.add_argument('--max-window', type=float, default=MAX_WINDOW, help='Largest adaptive window in seconds')
+    parser.add_argument('--target-events', type=int, default=TARGET_EVENTS, help='Adaptive mode shrinks the window above this many events')
+    parser.add_argument('--max-pages', type=int, default=MAX_PAGES, help='Adaptive mode shrinks the window above this many scroll pages')
+    parser.add_argument('--dedup', action='store_true', help='Drop events whose eventId was already written')
+    parser.add_argument('--dedup-capacity', type=int, default=DEDUP_CAPACITY, help='Number of recent eventIds kept for deduplication')
+    parser.add_argument('--dedup-index', required=False, help='File that keeps the deduplication (or --incremental change) index across restarts (implies --dedup without --incremental)')
+    parser.add_argument('--dedup-content-hash', action='store_true', help='Treat an eventId as new again when its content changed')
+    parser.add_argument('--incremental', action='store_true', help='Re-query a trailing lookback and emit only new or changed events, tagged created/updated')
+    parser.add_argument('--lookback', type=float, default=LOOKBACK, help='Seconds before each window re-queried in --incremental mode')
+    parser.add_argument('--metrics-port', type=int, required=False, help='Serve Prometheus metrics on this port at /metrics')
+    parser.add_argument('--severities', nargs='+', required=False, help='Only fetch events with these severities (e.g. 4 5)')
+    parser.add_argument('--saas', nargs='+', required=False, help='Only fetch events from these SaaS applications (e.g. office365_emails)')
+    parser.add_argument('--event-types', nargs='+', required=False, help='Only fetch these event types (e.g. phishing dlp)')
+    parser.add_argument('--event-states', nargs='+', required=False, help='Only fetch events in these states (e.g. new detected)')
+    parser.add_argument('--fields', nargs='+', choices=FIELD_NAMES, required=False, help='Only write these fields (txt/csv/ndjson/http); "actions" keeps the action columns')
+    parser.add_argument('--spool-dir', required=False, help='Spool fetched events in this directory and deliver them to the sink from there (at-least-once)')
+    parser.add_argument('--spool-max-mb', type=float, default=SPOOL_MAX_BYTES / 1024 / 1024, help='Spool size limit; the oldest events are dropped beyond it')
+    parser.add_argument('--spool-segment-mb', type=float, default=SPOOL_SEGMENT_BYTES / 1024 / 1024, help='Size of each spool segment file')
+    parser.add_argument('--pipeline-depth', type=int, default=PIPELINE_DEPTH, help='Pages fetched ahead of the writer, and batches flattened ahead of it (0 runs fetch, transform and write in sequence)')
+    parser.add_argument('--config', required=False, help='JSON file listing tenants to poll from this one process (see README)')
+    parser.add_argument('--workers', type=int, default=TENANT_WORKERS, help='Tenants fetched and written in parallel with --config')
+    parser.add_argument('--page-budget', type=int, default=TENANT_PAGE_BUDGET, help='Pages a tenant fetches per turn before yielding to the others with --config')
+    parser.add_argument('--metrics-textfile', required=False, help='Write Prometheus metrics to this file after every cycle (node_exporter textfile collector)')
+    return parser
+
+def main():
+    # Set up argument parser
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.config:
+        pollers = [TenantPoller(tenant_args, name) for name, tenant_args in load_tenants(args.config, args)]
+        print(f"Polling {len(pollers)} tenants with {args.workers} workers")
+        workers, page_budget = args.workers, args.page_budget
+    else:
+        missing = [option for option, value in (('--client-id', args.client_id), ('--access-key', args.access_key),
+                                                ('--host', args.host), ('--file-type', args.file_type)) if not value]
+        if missing:
+            parser.error(f"the following arguments are required without --config: {', '.join(missing)}")
+        pollers = [TenantPoller(args)]
+        workers, page_budget = 1, None
+
+    if args.metrics_port:
+        METRICS.serve(args.metrics_port)
+        print(f"Serving metrics on port {args.metrics_port} at /metrics")
 
-        # Wait for 5 minutes before the next execution
-        sleep(300)
+    run_pollers(pollers, workers, page_budget, args.metrics_textfile)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,204 @@
+import argparse
+import csv
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
+
+from HEC_event_format import EventFlattener
+from HEC_log_retirval_automated_bash import (BATCH_SIZE, WRITE_BUFFER_SIZE, iter_batches, ndjson_encoder, orjson,
+                                             pyarrow, save_to_parquet, write_chunks)
+
+READ_CHUNK_SIZE = 16 * 1024 * 1024  # Bytes read at a time while scanning for object boundaries
+RANGES_PER_WORKER = 4  # Byte ranges per worker, so one slow range doesn't leave the others idle
+
+# Every writer appends json.dumps(..., indent=4) plus a newline, so a top-level object always
+# starts with "{" at the beginning of a line while nested objects and strings never do
+OBJECT_START = b'\n{'
+# The opening of a pretty-printed object, used to recover the next object after a torn write
+PRETTY_OBJECT = re.compile(rb'\{\r?\n    "')
+
+loads = orjson.loads if orjson is not None else json.loads
+
+def find_boundary(file, offset):
+    """
+    Returns the position of the first top-level object starting at or after offset.
+    """
+    if offset == 0:
+        return 0
+    file.seek(offset - 1)
+    base = offset - 1
+    data = b''
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return base + len(data)
+        data += chunk
+        found = data.find(OBJECT_START)
+        if found != -1:
+            return base + found + 1
+        base += len(data) - 1
+        data = data[-1:]
+
+def split_ranges(path, parts):
+    """
+    Splits a file into at most `parts` byte ranges that each start on an object boundary.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        bounds = sorted({find_boundary(file, size * part // parts) for part in range(parts)})
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+def decode_objects(piece, stats):
+    """
+    Parses the text between two object boundaries. A write cut short by a crash runs
+    straight into the next object, so on failure parsing restarts at the next object
+    opening found in the piece.
+    """
+    while piece.strip():
+        try:
+            yield loads(piece)
+            return
+        except ValueError:
+            stats['skipped'] += 1
+            restart = PRETTY_OBJECT.search(piece, 1)
+            if restart is None:
+                return
+            piece = piece[restart.start():]
+
+def iter_objects(path, start, end, stats):
+    """
+    Yields the top-level objects in [start, end) of a file, holding at most one read chunk
+    plus the object being parsed in memory.
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start
+        buffer = b''
+        while True:
+            chunk = file.read(min(READ_CHUNK_SIZE, remaining))
+            remaining -= len(chunk)
+            buffer += chunk
+            position = 0
+            while True:
+                boundary = buffer.find(OBJECT_START, position)
+                if boundary == -1:
+                    break
+                yield from decode_objects(buffer[position:boundary + 1], stats)
+                position = boundary + 1
+            buffer = buffer[position:]
+            if not chunk:
+                yield from decode_objects(buffer, stats)
+                return
+
+def iter_events(path, start, end, stats):
+    """
+    Yields the events of a byte range. Manual and Windows scripts wrote whole API responses
+    ({"responseEnvelope": ..., "responseData": [...]}), the automated script single events.
+    """
+    for value in iter_objects(path, start, end, stats):
+        stats['objects'] += 1
+        if isinstance(value, dict) and 'responseData' in value:
+            events = value['responseData'] or []
+        elif isinstance(value, dict) and 'eventId' in value:
+            events = [value]
+        else:
+            stats['skipped'] += 1
+            continue
+        stats['events'] += len(events)
+        yield from events
+
+def convert_range(path, start, end, output_format, output, host):
+    """
+    Converts one byte range; csv and ndjson go to the part file `output`, parquet into the
+    partitioned directory `output`. Runs in a worker process.
+    """
+    stats = {'events': 0, 'objects': 0, 'skipped': 0}
+    events = iter_events(path, start, end, stats)
+    if output_format == 'parquet':
+        save_to_parquet(events, output, host)
+    elif output_format == 'csv':
+        flattener = EventFlattener(host)
+        with open(output, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as file:
+            write_chunks(file, map(flattener.encode_csv, iter_batches(events, BATCH_SIZE)))
+    else:
+        with open(output, 'wb', buffering=WRITE_BUFFER_SIZE) as file:
+            write_chunks(file, map(ndjson_encoder(host), iter_batches(events, BATCH_SIZE)))
+    return stats
+
+def append_part(file, part):
+    with open(part, 'rb') as source:
+        while True:
+            chunk = source.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            file.write(chunk)
+    os.remove(part)
+
+def add_stats(totals, stats):
+    for key in totals:
+        totals[key] += stats[key]
+
+def main():
+    # Converts HEC_log.txt archives (concatenated pretty-printed JSON written by the txt sinks)
+    # without loading them: each file is cut into byte ranges at top-level object boundaries
+    # and the ranges are parsed in parallel processes, then written in archive order
+    parser = argparse.ArgumentParser(description='Convert HEC_log.txt archives to CSV, NDJSON or Parquet.')
+    parser.add_argument('archives', nargs='+', help='HEC_log.txt files, converted in the order given')
+    parser.add_argument('--format', choices=['csv', 'ndjson', 'parquet'], required=True, help='Output format')
+    parser.add_argument('--output', required=True, help='Output file (csv/ndjson) or directory (parquet)')
+    parser.add_argument('--host', default='', help='Host the archive was pulled from; the India host rewrites entity links like the live sinks')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    if args.format == 'parquet' and pyarrow is None:
+        parser.error("Parquet output requires pyarrow: pip install pyarrow")
+
+    total_size = sum(os.path.getsize(path) for path in args.archives)
+    range_size = max(1, total_size // (args.workers * RANGES_PER_WORKER))
+    tasks = []
+    for path in args.archives:
+        for start, end in split_ranges(path, max(1, os.path.getsize(path) // range_size)):
+            part = args.output if args.format == 'parquet' else f"{args.output}.part{len(tasks)}"
+            tasks.append((path, start, end, args.format, part, args.host))
+
+    started = monotonic()
+    totals = {'events': 0, 'objects': 0, 'skipped': 0}
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(convert_range, *task) for task in tasks]
+            try:
+                if args.format == 'parquet':
+                    for future in futures:
+                        add_stats(totals, future.result())
+                else:
+                    with open(args.output, 'wb') as file:
+                        if args.format == 'csv':
+                            header = io.StringIO()
+                            csv.writer(header).writerow(EventFlattener(args.host).columns())
+                            file.write(header.getvalue().encode('utf-8'))
+                        # Parts are appended in archive order as soon as each one is finished
+                        for task, future in zip(tasks, futures):
+                            add_stats(totals, future.result())
+                            append_part(file, task[4])
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        if args.format != 'parquet':
+            for task in tasks:
+                if os.path.exists(task[4]):
+                    os.remove(task[4])
+
+    elapsed = monotonic() - started
+    print(f"{totals['events']} events from {totals['objects']} objects converted in {elapsed:.1f}s "
+          f"({total_size / (1024 * 1024) / elapsed if elapsed else 0:.1f} MB/s) to {args.output}")
+    if totals['skipped']:
+        print(f"{totals['skipped']} unreadable or unrecognised objects were skipped")
+
+if __name__ == "__main__":
+    main()
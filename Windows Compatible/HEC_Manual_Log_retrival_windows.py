@@ -80,6 +80,23 @@ class ApiClient:
         }
         return self.call_api('POST', 'event/query', body=payload)
 
+    def query_event_pages(self, start_date: str, end_date: str = None):
+        request_data = {
+            'startDate': start_date,
+            'endDate': end_date
+        }
+        payload = {
+            'requestData': request_data
+        }
+        # Follow the scrollId cursor until the API stops returning one
+        while True:
+            response = self.call_api('POST', 'event/query', body=payload)
+            yield response
+            scroll_id = (response.get('responseEnvelope') or {}).get('scrollId')
+            if not scroll_id or not response.get('responseData'):
+                break
+            request_data['scrollId'] = scroll_id
+
 def adjust_entity_link(entity_link, host):
     """
     Adjusts the entity link based on the provided host.
@@ -199,11 +216,12 @@ def main():
     logging.info(f"Querying events from {args.start_time} to {args.end_time}...")
 
     try:
-        events = client.query_events(args.start_time, args.end_time)
-        if args.output_format == 'txt':
-            save_logs_to_txt(events, args.end_time)
-        elif args.output_format == 'csv':
-            save_logs_to_csv(events, args.end_time)
+        # Save each scroll page as soon as it is fetched
+        for events in client.query_event_pages(args.start_time, args.end_time):
+            if args.output_format == 'txt':
+                save_logs_to_txt(events, args.end_time, args.host)
+            elif args.output_format == 'csv':
+                save_logs_to_csv(events, args.end_time, args.host)
     except Exception as e:
         logging.error(f"An error occurred during log retrieval: {e}")
 
@@ -1,11 +1,12 @@
 import requests
 import logging
 from uuid import uuid4
-from time import time, sleep
+from time import time, sleep, monotonic
 import json
 import csv
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import os
 import argparse
 
 # Configure logging
@@ -15,14 +16,29 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Polling schedule, all in seconds
+POLL_INTERVAL = 300  # How often a polling cycle starts
+SAFETY_LAG = 60  # Windows end this far behind now so late-indexed events are not skipped
+MAX_CATCHUP_WINDOW = 3600  # Largest window queried in one cycle when catching up after downtime
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# (connect, read) timeouts in seconds for every API call
+REQUEST_TIMEOUT = (5, 60)
+
 class ApiClient:
-    def __init__(self, client_id: str, access_key: str, host: str, api_version: str = 'v1.0'):
+    def __init__(self, client_id: str, access_key: str, host: str, api_version: str = 'v1.0',
+                 timeout: tuple = REQUEST_TIMEOUT):
         self.client_id = client_id
         self.access_key = access_key
         self.token = None
         self.token_expiry = None
         self.host = host
         self.api_version = api_version
+        self.timeout = timeout
+        # Reuse pooled keep-alive connections across polling cycles and scroll pages
+        self.session = requests.Session()
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
 
     def should_refresh_token(self):
         return not self.token or time() >= self.token_expiry
@@ -35,7 +51,7 @@ class ApiClient:
             }
             timestamp = time()
             try:
-                res = requests.post(f'https://{self.host}/auth/external', json=payload, timeout=10)
+                res = self.session.post(f'https://{self.host}/auth/external', json=payload, timeout=self.timeout)
                 res.raise_for_status()
                 res_data = res.json()['data']
                 self.token = res_data['token']
@@ -57,13 +73,13 @@ class ApiClient:
 
     def call_api(self, method: str, endpoint: str, params: dict = None, body: dict = None):
         try:
-            res = requests.request(
+            res = self.session.request(
                 method, 
                 f'https://{self.host}/app/hec-api/{self.api_version}/{endpoint}',
                 headers=self.headers(), 
                 params=params, 
                 json=body,
-                timeout=10
+                timeout=self.timeout
             )
             res.raise_for_status()
             return res.json()
@@ -81,6 +97,23 @@ class ApiClient:
         }
         return self.call_api('POST', 'event/query', body=payload)
 
+    def query_event_pages(self, start_date: str, end_date: str = None):
+        request_data = {
+            'startDate': start_date,
+            'endDate': end_date
+        }
+        payload = {
+            'requestData': request_data
+        }
+        # Follow the scrollId cursor until the API stops returning one
+        while True:
+            response = self.call_api('POST', 'event/query', body=payload)
+            yield response
+            scroll_id = (response.get('responseEnvelope') or {}).get('scrollId')
+            if not scroll_id or not response.get('responseData'):
+                break
+            request_data['scrollId'] = scroll_id
+
 def extract_recipient(description):
     """
     Extracts the recipient's email from the description using a regular expression.
@@ -173,8 +206,53 @@ def save_logs_to_csv(events, end_date, host):
             logging.info(f"Events successfully appended to 'HEC_log.csv' at {end_date}.")
         except PermissionError as e:
             logging.error(f"Failed to write to log.csv due to permission error: {e}")
+            # Re-raise so the watermark stays put and the window is fetched again next cycle
+            raise
         except Exception as e:
             logging.error(f"An unexpected error occurred while saving logs: {e}")
+            raise
+
+def load_watermark(state_file):
+    try:
+        with open(state_file) as file:
+            state = json.load(file)
+    except FileNotFoundError:
+        return None
+    return datetime.strptime(state['endDate'], DATE_FORMAT).replace(tzinfo=timezone.utc)
+
+def save_watermark(state_file, end_time):
+    # Write to a temp file and swap it in, so a crash never leaves a corrupt watermark
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, 'w') as file:
+        json.dump({'endDate': end_time.strftime(DATE_FORMAT)}, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, state_file)
+
+class WatermarkScheduler:
+    def __init__(self, state_file=None, interval=POLL_INTERVAL, safety_lag=SAFETY_LAG, max_window=MAX_CATCHUP_WINDOW):
+        self.state_file = state_file
+        self.interval = timedelta(seconds=interval)
+        self.safety_lag = timedelta(seconds=safety_lag)
+        self.max_window = timedelta(seconds=max_window)
+        self.watermark = load_watermark(state_file) if state_file else None
+
+    def next_window(self, now=None):
+        limit = (now or datetime.now(timezone.utc)).replace(microsecond=0) - self.safety_lag
+        start = self.watermark or limit - self.interval
+        end = min(limit, start + self.max_window)
+        if end <= start:
+            return None
+        return start, end
+
+    def commit(self, end):
+        self.watermark = end
+        if self.state_file:
+            save_watermark(self.state_file, end)
+
+    def is_behind(self, now=None):
+        limit = (now or datetime.now(timezone.utc)) - self.safety_lag
+        return self.watermark is not None and limit - self.watermark > self.interval
 
 def main():
     # Set up argument parser
@@ -183,32 +261,49 @@ def main():
     parser.add_argument('--access-key', required=True, help='Your Access Key')
     parser.add_argument('--host', required=True, help='API Host (e.g., cloudinfra-gw-us.portal.checkpoint.com)')
     parser.add_argument('--output-format', required=True, choices=['txt', 'csv'], help='Output format: txt or csv')
+    parser.add_argument('--state-file', default='HEC_watermark.json', help='File that stores the last written endDate, so restarts resume without gaps')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help='Seconds between polling cycles')
+    parser.add_argument('--safety-lag', type=float, default=SAFETY_LAG, help='Seconds behind now each window ends')
+    parser.add_argument('--max-catchup', type=float, default=MAX_CATCHUP_WINDOW, help='Largest window in seconds queried per cycle while catching up')
     args = parser.parse_args()
 
     # Create the API client with command-line arguments
     client = ApiClient(args.client_id, args.access_key, args.host)
 
-    # Continuously run every 5 minutes
+    scheduler = WatermarkScheduler(args.state_file, args.interval, args.safety_lag, args.max_catchup)
+
+    # Cycles start on a fixed cadence, so query and write time never turn into gaps
+    next_run = monotonic()
     while True:
-        end_time = datetime.utcnow()
-        start_time = end_time - timedelta(minutes=5)
+        window = scheduler.next_window()
+        succeeded = False
+        if window:
+            start_date = window[0].strftime(DATE_FORMAT)
+            end_date = window[1].strftime(DATE_FORMAT)
 
-        start_date = start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-        end_date = end_time.strftime('%Y-%m-%dT%H:%M:%SZ')
+            logging.info(f"Querying events from {start_date} to {end_date}...")
 
-        logging.info(f"Querying events from {start_date} to {end_date}...")
+            try:
+                for events in client.query_event_pages(start_date, end_date):
+                    if args.output_format == 'txt':
+                        save_logs_to_txt(events, end_date, args.host)
+                    elif args.output_format == 'csv':
+                        save_logs_to_csv(events, end_date, args.host)
+                scheduler.commit(window[1])
+                succeeded = True
+            except Exception as e:
+                logging.error(f"An error occurred: {e}")
 
-        try:
-            events = client.query_events(start_date, end_date)
-            if args.output_format == 'txt':
-                save_logs_to_txt(events, end_date)
-            elif args.output_format == 'csv':
-                save_logs_to_csv(events, end_date)
-        except Exception as e:
-            logging.error(f"An error occurred: {e}")
+        # After downtime, keep catching up in bounded chunks without waiting
+        if succeeded and scheduler.is_behind():
+            continue
 
-        # Wait for 5 minutes before the next execution
-        sleep(300)
+        next_run += args.interval
+        delay = next_run - monotonic()
+        if delay > 0:
+            sleep(delay)
+        else:
+            next_run = monotonic()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,107 @@
+"""
+CSV flattening throughput: the previous per-row writer against EventFlattener + writerows,
+on synthetic events with many actions each.
+
+    python3 benchmarks/bench_flatten.py --events 20000 --actions 8
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HEC_log_retirval_automated_bash as hec  # noqa: E402
+from HEC_event_format import ACTION_COLUMNS, EVENT_COLUMNS  # noqa: E402
+from synthetic_events import generate_event  # noqa: E402
+
+HOST = 'cloudinfra-gw.in.portal.checkpoint.com'
+
+
+def legacy_extract_recipient(description):
+    match = re.search(r"([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})", description)
+    return match.group(1) if match else ""
+
+
+def legacy_adjust_entity_link(entity_link, host):
+    if host == 'cloudinfra-gw.in.portal.checkpoint.com' and 'portal.checkpoint.com' in entity_link:
+        return entity_link.replace('portal.checkpoint.com', 'in.portal.checkpoint.com')
+    return entity_link
+
+
+def legacy_save_to_csv(log_data, file_path, host, buffer_size):
+    """save_to_csv before EventFlattener: one base_data list and writerow per action."""
+    with open(file_path, 'a', newline='') as file:
+        writer = csv.writer(file)
+        if file.tell() == 0:
+            writer.writerow(EVENT_COLUMNS + ACTION_COLUMNS)
+        for i in range(0, len(log_data), buffer_size):
+            for event in log_data[i:i + buffer_size]:
+                description = event.get('description', '')
+                base_data = [
+                    event.get('eventId', ''), event.get('customerId', ''), event.get('saas', ''),
+                    event.get('entityId', ''), event.get('state', ''), event.get('type', ''),
+                    event.get('confidenceIndicator', ''), event.get('eventCreated', ''),
+                    event.get('severity', ''), description, event.get('senderAddress', ''),
+                    json.dumps(event.get('data', '')), legacy_extract_recipient(description),
+                    legacy_adjust_entity_link(event.get('entityLink', ''), host)
+                ]
+                actions = event.get('actions', [])
+                if actions:
+                    for action in actions:
+                        writer.writerow(base_data + [action.get('actionType', ''), action.get('createTime', ''),
+                                                     action.get('relatedEntityId', '')])
+                else:
+                    writer.writerow(base_data + ['', '', ''])
+
+
+def synthetic_events(count, actions):
+    events = []
+    for i in range(count):
+        event = generate_event(i)
+        event['description'] = (f"Phishing email from attacker@example.net to user{i}@example.com, "
+                                f"cc finance{i}@example.com and audit@example.org")
+        event['data'] = {"subject": "Invoice " * 10, "headers": {f"h{n}": "x" * 40 for n in range(10)}}
+        event['actions'] = [{"actionType": f"action{n}", "createTime": "2024-01-01T00:00:01Z",
+                             "relatedEntityId": f"entity-{i}-{n}"} for n in range(actions)]
+        events.append(event)
+    return events
+
+
+def run(name, writer, events, path, rounds):
+    elapsed = None
+    for _ in range(rounds):
+        if os.path.exists(path):
+            os.remove(path)
+        started = perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            writer(events, path, HOST, hec.BATCH_SIZE)
+        elapsed = min(elapsed or float('inf'), perf_counter() - started)
+    with open(path) as file:
+        rows = sum(1 for _ in csv.reader(file)) - 1
+    print(f"{name:>10}: {len(events) / elapsed:>9,.0f} events/s  {rows / elapsed:>10,.0f} rows/s  {elapsed:.2f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CSV flattening.')
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--actions', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events, args.actions)
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy = run('legacy', legacy_save_to_csv, events, os.path.join(workdir, 'legacy.csv'), args.rounds)
+        current = run('flattener', hec.save_to_csv, events, os.path.join(workdir, 'flattener.csv'), args.rounds)
+    print(f"speedup: {legacy / current:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+End-to-end benchmark of the automated script against the local mock HEC API.
+
+For each output mode the fetch + write path runs in a fresh child process, so peak RSS
+is that mode's alone (the mock server and its events live in the parent; the http mode's
+stand-in collector runs in the child but only counts what it receives). Reports
+events/s, p50/p99 page latency, peak RSS and bytes written.
+
+    python3 benchmarks/bench_suite.py --events 50000 --page-size 500 --latency-ms 20
+    python3 benchmarks/bench_suite.py --modes csv syslog --throttle-rate 0.05 --json results.json
+    python3 benchmarks/bench_suite.py --modes csv --latency-ms 20 --pipeline-depth 0   # sequential
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+from itertools import chain
+from time import perf_counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import HEC_log_retirval_automated_bash as hec  # noqa: E402
+
+MODES = ['txt', 'csv', 'ndjson', 'parquet', 'syslog', 'http']
+START_DATE = '2024-01-01T00:00:00Z'
+END_DATE = '2030-01-01T00:00:00Z'
+
+
+class TimedApiClient(hec.ApiClient):
+    """Records the wall time of every call_api, retries included."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def call_api(self, *args, **kwargs):
+        started = perf_counter()
+        try:
+            return super().call_api(*args, **kwargs)
+        finally:
+            self.latencies.append(perf_counter() - started)
+
+
+class SyslogListener:
+    """TCP listener that counts the bytes a SyslogForwarder delivers."""
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        self.bytes_received = 0
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        connection, _ = self.sock.accept()
+        with connection:
+            while True:
+                data = connection.recv(1 << 20)
+                if not data:
+                    break
+                self.bytes_received += len(data)
+
+    def wait(self):
+        self.thread.join(timeout=30)
+        self.sock.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_rss_mb():
+    # VmHWM belongs to this process image only; ru_maxrss would also count the parent
+    # (and its in-memory mock events) as it was at fork time, before exec
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def run_child(mode, host, pipeline_depth):
+    """Runs one mode in this process and returns its measurements."""
+    with tempfile.TemporaryDirectory() as workdir:
+        output = os.path.join(workdir, 'parquet' if mode == 'parquet' else f'events.{mode}')
+        listener = forwarder = collector = None
+        if mode == 'syslog':
+            listener = SyslogListener()
+            forwarder = hec.SyslogForwarder('127.0.0.1', listener.port, 'tcp')
+        elif mode == 'http':
+            from mock_collector import MockCollector
+            collector = MockCollector(keep_events=False).start()
+            forwarder = hec.HttpCollector(collector.url)
+
+        client = TimedApiClient('bench', 'bench', host, scheme='http')
+        args = argparse.Namespace(file_type=mode, output_file=output, host=host,
+                                  row_group_size=hec.PARQUET_ROW_GROUP_SIZE, pipeline_depth=pipeline_depth)
+        events = 0
+
+        def counted(stream):
+            nonlocal events
+            for event in stream:
+                events += 1
+                yield event
+
+        started = perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            pages = client.iter_event_pages(START_DATE, END_DATE)
+            if pipeline_depth:
+                pages = hec.pipelined(pages, pipeline_depth, name='fetch')
+            hec.write_events(args, counted(chain.from_iterable(pages)), forwarder)
+        if forwarder:
+            forwarder.close()
+        if listener:
+            listener.wait()
+        elapsed = perf_counter() - started
+
+        return {
+            "mode": mode,
+            "events": events,
+            "pages": len(client.latencies),
+            "seconds": round(elapsed, 3),
+            "events_per_sec": round(events / elapsed, 1),
+            "p50_page_ms": round(percentile(client.latencies, 0.50) * 1000, 2),
+            "p99_page_ms": round(percentile(client.latencies, 0.99) * 1000, 2),
+            "retries": client.retries,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "bytes_written": (listener.bytes_received if listener else
+                              collector.stats()['bytes_received'] if collector else directory_size(output)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fetch + write throughput per output mode.')
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Mean latency the mock adds per request')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of queries failed with 503')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='Share of queries throttled with 429')
+    parser.add_argument('--retry-after', type=float, default=0.1, help='Retry-After seconds sent with 429')
+    parser.add_argument('--pipeline-depth', type=int, default=hec.PIPELINE_DEPTH,
+                        help='Fetch/transform read-ahead, as in the script (0 runs the stages in sequence)')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=None)
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--host', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.host, args.pipeline_depth)))
+        return
+
+    from mock_hec_server import MockHecServer
+    modes = args.modes or [mode for mode in MODES if mode != 'parquet' or hec.pyarrow is not None]
+    results = []
+    with MockHecServer(args.events, args.page_size, latency=args.latency_ms / 1000, error_rate=args.error_rate,
+                       throttle_rate=args.throttle_rate, retry_after=args.retry_after) as server:
+        for mode in modes:
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, '--host', server.host,
+                                    '--pipeline-depth', str(args.pipeline_depth)],
+                                   capture_output=True, text=True)
+            if child.returncode:
+                print(f"{mode}: failed\n{child.stderr}", file=sys.stderr)
+                continue
+            results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    columns = ['mode', 'events', 'pages', 'events_per_sec', 'p50_page_ms', 'p99_page_ms', 'retries',
+               'peak_rss_mb', 'bytes_written']
+    print('  '.join(f"{column:>14}" for column in columns))
+    for result in results:
+        print('  '.join(f"{result[column]:>14}" for column in columns))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
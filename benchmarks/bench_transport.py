@@ -0,0 +1,108 @@
+"""
+Pages-per-second of the pooled keep-alive ApiClient against the previous
+per-call requests.request/requests.post transport, using the local mock server.
+
+    python3 benchmarks/bench_transport.py --events 20000 --page-size 50 --tls --connect-delay-ms 30
+
+--tls needs the openssl binary to create a throwaway self-signed certificate.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from HEC_log_retirval_automated_bash import ApiClient  # noqa: E402
+from mock_hec_server import MockHecServer  # noqa: E402
+
+
+class PerCallClient(ApiClient):
+    """ApiClient as it was before pooling: a new connection for every call."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Its own token fields, bypassing the shared TokenProvider like the old client did
+        self.token = None
+        self.token_expiry = None
+
+    def generate_authorization_token(self):
+        if self.should_refresh_token():
+            res = requests.post(f'{self.base_url}/auth/external',
+                                json={"clientId": self.client_id, "accessKey": self.access_key})
+            res.raise_for_status()
+            res_data = res.json()['data']
+            self.token = res_data['token']
+            self.token_expiry = perf_counter() + res_data['expiresIn']
+        return self.token
+
+    def should_refresh_token(self):
+        return not self.token or perf_counter() >= self.token_expiry
+
+    def call_api(self, method, endpoint, params=None, body=None):
+        res = requests.request(method, f'{self.base_url}/app/hec-api/{self.api_version}/{endpoint}',
+                               headers=self.headers(), params=params, json=body)
+        res.raise_for_status()
+        return res.json()
+
+
+def drain(client):
+    pages = 0
+    events = 0
+    started = perf_counter()
+    for page in client.iter_event_pages('2024-01-01T00:00:00Z', '2024-01-02T00:00:00Z'):
+        pages += 1
+        events += len(page)
+    return pages, events, perf_counter() - started
+
+
+def make_certificate(directory):
+    certfile = os.path.join(directory, 'cert.pem')
+    keyfile = os.path.join(directory, 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+        '-keyout', keyfile, '-out', certfile
+    ], check=True, capture_output=True)
+    return certfile, keyfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pooled vs per-call HTTP transport.')
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--tls', action='store_true', help='Serve HTTPS with a throwaway self-signed certificate')
+    parser.add_argument('--connect-delay-ms', type=float, default=0.0,
+                        help='Extra delay the mock adds to every new connection')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        certfile = keyfile = None
+        scheme = 'http'
+        if args.tls:
+            certfile, keyfile = make_certificate(workdir)
+            # Picked up by both requests.request and Session.request
+            os.environ['REQUESTS_CA_BUNDLE'] = certfile
+            scheme = 'https'
+
+        with MockHecServer(args.events, args.page_size, connect_delay=args.connect_delay_ms / 1000,
+                           certfile=certfile, keyfile=keyfile) as server:
+            results = {}
+            for name, cls in (('per-call', PerCallClient), ('pooled', ApiClient)):
+                best = None
+                for _ in range(args.rounds):
+                    with cls('bench', 'bench', server.host, scheme=scheme) as client:
+                        pages, events, elapsed = drain(client)
+                    best = elapsed if best is None else min(best, elapsed)
+                results[name] = pages / best
+                print(f"{name:>9}: {pages} pages, {events} events, {best:.3f}s, {pages / best:,.0f} pages/s")
+            print(f"  speedup: {results['pooled'] / results['per-call']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
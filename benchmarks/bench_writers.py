@@ -0,0 +1,64 @@
+"""
+Throughput of the indented txt writer against the ndjson writer (orjson and stdlib json).
+
+    python3 benchmarks/bench_writers.py --events 50000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HEC_log_retirval_automated_bash as hec  # noqa: E402
+from synthetic_events import generate_event  # noqa: E402
+
+_stdlib_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def stdlib_dumps_line(event):
+    return (_stdlib_encoder.encode(event) + '\n').encode('utf-8')
+
+
+def run(name, writer, events, path):
+    if os.path.exists(path):
+        os.remove(path)
+    started = perf_counter()
+    # The writers print a summary line per call; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        writer(events, path)
+    elapsed = perf_counter() - started
+    size = os.path.getsize(path)
+    print(f"{name:>16}: {len(events) / elapsed:>10,.0f} events/s  {size / elapsed / 1e6:>7.1f} MB/s  {size / 1e6:>8.1f} MB")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark txt vs ndjson writers.')
+    parser.add_argument('--events', type=int, default=50000)
+    args = parser.parse_args()
+
+    events = [generate_event(i) for i in range(args.events)]
+    host = 'cloudinfra-gw-us.portal.checkpoint.com'
+
+    with tempfile.TemporaryDirectory() as workdir:
+        txt = run('txt (indent=4)', lambda e, p: hec.save_to_txt(e, p, hec.BATCH_SIZE),
+                  events, os.path.join(workdir, 'events.txt'))
+        if hec.orjson is not None:
+            run('ndjson (orjson)', lambda e, p: hec.save_to_ndjson(e, p, host, hec.BATCH_SIZE),
+                events, os.path.join(workdir, 'events.orjson.ndjson'))
+        fast_dumps, hec.dumps_line = hec.dumps_line, stdlib_dumps_line
+        try:
+            ndjson = run('ndjson (json)', lambda e, p: hec.save_to_ndjson(e, p, host, hec.BATCH_SIZE),
+                         events, os.path.join(workdir, 'events.json.ndjson'))
+        finally:
+            hec.dumps_line = fast_dumps
+    print(f"ndjson (json) is {txt / ndjson:.1f}x faster than txt")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Local stand-in for an HTTP event collector (Splunk HEC-style endpoint or generic webhook),
+for exercising and benchmarking the script's http sink without a real SIEM.
+
+Accepts gzip or plain NDJSON bodies on any POST path, checks the Authorization header when a
+token is set, and can add latency or fail a share of requests with 503.
+
+    python3 benchmarks/mock_collector.py --port 8088 --token secret --error-rate 0.1
+"""
+import gzip
+import json
+import random
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+            roll = server.rng.random()
+        if server.latency:
+            sleep(server.latency)
+        if server.token and self.headers.get('Authorization', '').split(' ')[-1] != server.token:
+            self._reply(401, {"text": "Invalid token", "code": 4})
+            return
+        if roll < server.error_rate:
+            with server.lock:
+                server.errors += 1
+            self._reply(503, {"text": "Server is busy", "code": 9})
+            return
+
+        raw = gzip.decompress(body) if self.headers.get('Content-Encoding') == 'gzip' else body
+        lines = [line for line in raw.splitlines() if line.strip()]
+        with server.lock:
+            server.bytes_received += len(body)
+            server.bytes_uncompressed += len(raw)
+            server.event_count += len(lines)
+            if server.keep_events:
+                server.events.extend(json.loads(line) for line in lines)
+        self._reply(200, {"text": "Success", "code": 0})
+
+
+class MockCollector:
+    def __init__(self, bind='127.0.0.1', port=0, token=None, latency=0.0, error_rate=0.0, seed=0, keep_events=True):
+        self.httpd = ThreadingHTTPServer((bind, port), _Handler)
+        self.httpd.daemon_threads = True
+        httpd = self.httpd
+        httpd.token = token
+        httpd.latency = latency
+        httpd.error_rate = error_rate
+        httpd.rng = random.Random(seed)
+        httpd.lock = threading.Lock()
+        httpd.keep_events = keep_events  # Benchmarks only count events, so the stand-in costs little CPU
+        httpd.events = []
+        httpd.event_count = 0
+        httpd.requests = 0
+        httpd.errors = 0
+        httpd.bytes_received = 0
+        httpd.bytes_uncompressed = 0
+        httpd.connections = set()
+        self.thread = None
+
+    @property
+    def url(self):
+        bind, port = self.httpd.server_address[:2]
+        return f'http://{bind}:{port}/services/collector/event'
+
+    @property
+    def events(self):
+        return self.httpd.events
+
+    def stats(self):
+        httpd = self.httpd
+        return {"requests": httpd.requests, "errors_injected": httpd.errors, "events": httpd.event_count,
+                "bytes_received": httpd.bytes_received, "bytes_uncompressed": httpd.bytes_uncompressed,
+                "connections": len(httpd.connections)}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Run a local mock HTTP event collector.')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--token', help='Require this token in the Authorization header')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Added latency per request')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of requests answered with 503')
+    args = parser.parse_args()
+    collector = MockCollector(port=args.port, token=args.token, latency=args.latency_ms / 1000,
+                              error_rate=args.error_rate)
+    print(f"Mock collector listening on {collector.url}")
+    collector.httpd.serve_forever()
@@ -0,0 +1,208 @@
+"""
+Local stand-in for the Harmony Email & Collaboration API, used by the benchmarks.
+
+Implements POST /auth/external (returning expiresIn) and
+POST /app/hec-api/<version>/event/query with startDate/endDate filtering and scrollId
+paging over a fixed set of synthetic events. Responses are gzip encoded when the client
+asks for it, and connections are kept alive (HTTP/1.1).
+
+To model a real gateway it can add per-request latency, fail a share of requests with
+5xx, throttle a share with 429 + Retry-After, serve TLS, and delay each new connection.
+"""
+import bisect
+import gzip
+import json
+import random
+import socket
+import ssl
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from uuid import uuid4
+
+from synthetic_events import generate_events
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        # Stand-in for the round trips a new TCP/TLS connection costs against a remote gateway
+        if self.server.connect_delay:
+            sleep(self.server.connect_delay)
+        super().setup()
+        # Headers and body go out in separate writes; without this Nagle stalls keep-alive clients
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_failure(self):
+        server = self.server
+        with server.lock:
+            roll = server.rng.random()
+        if roll < server.throttle_rate:
+            server.throttled += 1
+            self._send_json(429, {"error": "Too Many Requests"}, {'Retry-After': str(server.retry_after)})
+            return True
+        if roll < server.throttle_rate + server.error_rate:
+            server.errors += 1
+            self._send_json(503, {"error": "Service Unavailable"})
+            return True
+        return False
+
+    def do_POST(self):
+        server = self.server
+        body = self._read_json()
+        if server.latency:
+            sleep(server.latency * (0.5 + server.rng.random()))
+
+        if self.path == '/auth/external':
+            server.auth_calls += 1
+            self._send_json(200, {"data": {"token": str(uuid4()), "expiresIn": server.expires_in}})
+        elif self.path.endswith('/event/query'):
+            server.query_calls += 1
+            if self._inject_failure():
+                return
+            request_data = body.get('requestData', {})
+            start = _parse_date(request_data.get('startDate'))
+            end = _parse_date(request_data.get('endDate'))
+            first = bisect.bisect_left(server.created, start) if start else 0
+            last = bisect.bisect_right(server.created, end) if end else len(server.events)
+            offset = max(first, int(request_data.get('scrollId') or 0))
+            matches = _filter(request_data)
+            if matches is None:
+                events = server.events[offset:min(offset + server.page_size, last)]
+                next_offset = offset + len(events)
+            else:
+                # Scan until a page of matching events is found; scrollId resumes after the scan
+                events = []
+                next_offset = offset
+                while next_offset < last and len(events) < server.page_size:
+                    if matches(server.events[next_offset]):
+                        events.append(server.events[next_offset])
+                    next_offset += 1
+            self._send_json(200, {
+                "responseEnvelope": {
+                    "requestId": str(uuid4()),
+                    "responseCode": 200,
+                    "responseText": "",
+                    "additionalText": "",
+                    "recordsNumber": len(events),
+                    "scrollId": str(next_offset) if next_offset < last else None
+                },
+                "responseData": events
+            })
+        else:
+            self._send_json(404, {"error": "not found"})
+
+
+# requestData filters the mock honours, as event field -> request key
+FILTERS = {'severity': 'severities', 'saas': 'saas', 'type': 'eventTypes', 'state': 'eventStates'}
+
+
+def _filter(request_data):
+    wanted = {field: set(map(str, request_data[key])) for field, key in FILTERS.items() if request_data.get(key)}
+    if not wanted:
+        return None
+    return lambda event: all(str(event.get(field)) in values for field, values in wanted.items())
+
+
+class MockHecServer:
+    def __init__(self, total_events=1000, page_size=100, expires_in=3600, bind='127.0.0.1', port=0,
+                 connect_delay=0.0, certfile=None, keyfile=None, latency=0.0, error_rate=0.0,
+                 throttle_rate=0.0, retry_after=1, events=None, seed=0):
+        self.httpd = ThreadingHTTPServer((bind, port), _Handler)
+        self.httpd.daemon_threads = True
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+
+        events = events if events is not None else generate_events(total_events, seed=seed)
+        events = sorted(events, key=lambda event: event['eventCreated'])
+        httpd = self.httpd
+        httpd.events = events
+        httpd.created = [_parse_date(event['eventCreated']) for event in events]
+        httpd.page_size = page_size
+        httpd.expires_in = expires_in
+        httpd.connect_delay = connect_delay
+        httpd.latency = latency
+        httpd.error_rate = error_rate
+        httpd.throttle_rate = throttle_rate
+        httpd.retry_after = retry_after
+        httpd.rng = random.Random(seed)
+        httpd.lock = threading.Lock()
+        httpd.auth_calls = 0
+        httpd.query_calls = 0
+        httpd.errors = 0
+        httpd.throttled = 0
+        self.thread = None
+
+    @property
+    def host(self):
+        bind, port = self.httpd.server_address[:2]
+        return f'{bind}:{port}'
+
+    def stats(self):
+        httpd = self.httpd
+        return {"auth_calls": httpd.auth_calls, "query_calls": httpd.query_calls,
+                "errors_injected": httpd.errors, "throttled": httpd.throttled}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Run a local mock HEC API server.')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--expires-in', type=float, default=3600, help='Token lifetime in seconds')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Mean added latency per request')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of queries answered with 503')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='Share of queries answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1, help='Retry-After seconds sent with 429')
+    args = parser.parse_args()
+    server = MockHecServer(args.events, args.page_size, args.expires_in, port=args.port,
+                           latency=args.latency_ms / 1000, error_rate=args.error_rate,
+                           throttle_rate=args.throttle_rate, retry_after=args.retry_after)
+    print(f"Mock HEC API listening on http://{server.host}")
+    server.httpd.serve_forever()
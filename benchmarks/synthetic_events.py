@@ -0,0 +1,78 @@
+"""
+Synthetic HEC security events with realistic field sizes, for the mock API and benchmarks.
+
+Sizes roughly follow production events: a description of a few hundred bytes naming
+the sender and 1-5 recipients, a `data` blob of about 1-2 KB of headers, URLs and
+attachment metadata, and 0-4 actions.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+SAAS = ['office365_emails', 'google_mail', 'office365_onedrive', 'office365_sharepoint', 'slack', 'teams']
+TYPES = ['phishing', 'suspicious_phishing', 'malware', 'suspicious_malware', 'dlp', 'anomaly', 'spam']
+STATES = ['new', 'detected', 'pending', 'remediated', 'exception', 'dismissed']
+ACTIONS = ['quarantine', 'restore', 'dismiss', 'block_sender', 'notify_user', 'alert_admin']
+WORDS = ('invoice payment urgent account verify password shared document review wire transfer '
+         'delivery notice mailbox quota expired security update confirm details').split()
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _address(rng, domain=None):
+    return f"{rng.choice(WORDS)}.{rng.randrange(10000)}@{domain or rng.choice(['example.com', 'example.org', 'corp.example'])}"
+
+
+def generate_event(index, rng=None, start=EPOCH, spacing_seconds=1.0, max_actions=4, data_bytes=1500):
+    """
+    Builds one event. Deterministic for a given index when no rng is passed.
+    """
+    rng = rng or random.Random(index)
+    sender = _address(rng, 'sender.example.net')
+    recipients = [_address(rng) for _ in range(rng.randint(1, 5))]
+    event_type = rng.choice(TYPES)
+    created = start + timedelta(seconds=spacing_seconds * (index + rng.random()))
+    subject = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 10)))
+    filler = ' '.join(rng.choice(WORDS) for _ in range(30))
+
+    data = {
+        "subject": subject,
+        "fromAddress": sender,
+        "toAddresses": recipients,
+        "headers": [{"name": f"X-Header-{n}", "value": filler[:rng.randint(20, 80)]} for n in range(8)],
+        "urls": [f"https://{rng.choice(WORDS)}.example.net/{rng.getrandbits(64):x}" for _ in range(rng.randint(0, 6))],
+        "attachments": [{"name": f"{rng.choice(WORDS)}.pdf", "size": rng.randint(1000, 5000000),
+                         "sha256": f"{rng.getrandbits(256):064x}"} for _ in range(rng.randint(0, 3))],
+    }
+    used = len(str(data))
+    if used < data_bytes:
+        data["body"] = (filler + ' ') * ((data_bytes - used) // (len(filler) + 1) + 1)
+
+    entity_id = f"{rng.getrandbits(128):032x}"
+    actions = [{
+        "actionType": rng.choice(ACTIONS),
+        "createTime": (created + timedelta(seconds=rng.randint(1, 600))).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+        "relatedEntityId": entity_id
+    } for _ in range(rng.randint(0, max_actions))]
+
+    return {
+        "eventId": f"{index:08x}{rng.getrandbits(96):024x}",
+        "customerId": "mock-customer",
+        "saas": rng.choice(SAAS),
+        "entityId": entity_id,
+        "state": rng.choice(STATES),
+        "type": event_type,
+        "confidenceIndicator": rng.choice(['malicious', 'suspicious', 'low']),
+        "eventCreated": created.strftime('%Y-%m-%dT%H:%M:%S.%f+00:00'),
+        "severity": str(rng.randint(1, 5)),
+        "description": (f"{event_type.replace('_', ' ').capitalize()} detected in an email from {sender} "
+                        f"to {', '.join(recipients)} with subject '{subject}'. {filler[:rng.randint(40, 200)]}"),
+        "senderAddress": sender,
+        "data": data,
+        "entityLink": f"https://portal.checkpoint.com/dashboard/entity/{entity_id}",
+        "actions": actions,
+    }
+
+
+def generate_events(count, seed=0, **kwargs):
+    rng = random.Random(seed)
+    return [generate_event(index, rng, **kwargs) for index in range(count)]
@@ -0,0 +1,45 @@
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import HEC_log_retirval_automated_bash as hec
+
+
+def make_events(count):
+    return [{'eventId': f'event-{index}', 'state': 'new', 'actions': []} for index in range(count)]
+
+
+class ChangeTrackerCapacityTest(unittest.TestCase):
+    def run_cycle(self, tracker, events):
+        emitted = list(tracker.filter(events))
+        tracker.commit()
+        tracker.end_window()
+        return [record['changeType'] for record in emitted]
+
+    def test_lookback_larger_than_capacity_stops_reemitting(self):
+        tracker = hec.ChangeTracker(capacity=900)
+        events = make_events(1000)
+
+        self.assertEqual(self.run_cycle(tracker, events), ['created'] * 1000)
+        self.assertEqual(tracker.capacity, 2000)
+        # Only the fingerprints evicted during the first scan come back, and only once
+        self.assertEqual(self.run_cycle(tracker, events), ['created'] * 100)
+        self.assertEqual(self.run_cycle(tracker, events), [])
+
+    def test_updated_event_carries_only_new_actions(self):
+        tracker = hec.ChangeTracker(capacity=10)
+        event = {'eventId': 'a', 'state': 'new', 'actions': [{'actionType': 'quarantine'}]}
+        self.run_cycle(tracker, [event])
+        changed = {**event, 'state': 'remediated', 'actions': event['actions'] + [{'actionType': 'restore'}]}
+
+        records = list(tracker.filter([changed]))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['changeType'], 'updated')
+        self.assertEqual(records[0]['actions'], [{'actionType': 'restore'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import HEC_log_retirval_automated_bash as hec
+
+
+class DedupIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.index_file = os.path.join(self.directory.name, 'dedup.tsv')
+
+    def line_count(self):
+        with open(self.index_file) as file:
+            return sum(1 for _ in file)
+
+    def test_commit_compacts_index(self):
+        deduplicator = hec.EventDeduplicator(capacity=100, index_file=self.index_file)
+        for cycle in range(10):
+            events = [{'eventId': f'{cycle}-{index}'} for index in range(50)]
+            self.assertEqual(len(list(deduplicator.filter(events))), 50)
+            deduplicator.commit()
+            self.assertLessEqual(self.line_count(), 200)
+
+        # A restart still remembers the most recent window
+        restarted = hec.EventDeduplicator(capacity=100, index_file=self.index_file)
+        self.assertEqual(list(restarted.filter([{'eventId': '9-0'}, {'eventId': 'new'}])), [{'eventId': 'new'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
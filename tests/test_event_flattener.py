@@ -0,0 +1,31 @@
+import csv
+import io
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from HEC_event_format import EventFlattener
+
+
+class EventFlattenerTest(unittest.TestCase):
+    def test_multi_action_rows_match_csv_writer(self):
+        # Quoted fields containing CRLF must survive the shared-prefix fast path
+        event = {'eventId': 'a', 'description': 'line one\r\nline two to victim@example.com', 'data': {'x': 1},
+                 'actions': [{'actionType': 'quarantine', 'createTime': 't1', 'relatedEntityId': 'first\r\nsecond'},
+                             {'actionType': 'restore', 'createTime': 't2', 'relatedEntityId': 'x,"y"'},
+                             {'actionType': 'delete\r\n', 'createTime': 't3'}]}
+        flattener = EventFlattener('')
+        chunk, count = flattener.encode_csv([event, {'eventId': 'b'}])
+
+        expected = io.StringIO()
+        csv.writer(expected).writerows(flattener.rows(event) + flattener.rows({'eventId': 'b'}))
+        self.assertEqual(count, 2)
+        self.assertEqual(chunk, expected.getvalue())
+        self.assertEqual(len(list(csv.reader(io.StringIO(chunk, newline='')))), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
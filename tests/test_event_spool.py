@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import HEC_log_retirval_automated_bash as hec
+
+
+class EventSpoolTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def open_spool(self):
+        spool = hec.EventSpool(self.directory, sinks=['csv'], segment_bytes=200)
+        self.addCleanup(spool.close)
+        return spool
+
+    def test_torn_offsets_file_replays_from_oldest_segment(self):
+        spool = self.open_spool()
+        spool.append([{'eventId': f'event-{index}'} for index in range(10)])
+        spool.append([{'eventId': f'event-{index}'} for index in range(10, 20)])
+        events, position = spool.read('csv', max_events=5)
+        spool.commit('csv', position)
+        spool.close()
+
+        for content in ('', '{"csv": [1, '):
+            with open(os.path.join(self.directory, hec.EventSpool.OFFSETS_FILE), 'w') as file:
+                file.write(content)
+            events, _ = self.open_spool().read('csv')
+            self.assertEqual([event['eventId'] for event in events], [f'event-{index}' for index in range(20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import HEC_log_retirval_automated_bash as hec
+
+
+def make_event(event_id, state, actions):
+    return {'eventId': event_id, 'saas': 'office365_emails', 'state': state, 'severity': '3',
+            'eventCreated': '2024-01-01T00:00:00', 'senderAddress': 'sender@example.com',
+            'description': 'Sent to victim@example.com',
+            'actions': [{'actionType': action, 'createTime': '2024-01-01T00:00:00'} for action in actions]}
+
+
+class EventStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = hec.EventStore(os.path.join(directory.name, 'events.db'))
+        self.addCleanup(self.store.close)
+        self.flattener = hec.EventFlattener('')
+
+    def test_duplicate_event_in_one_batch_keeps_last_copy(self):
+        batch = [make_event('a', 'new', ['quarantine']), make_event('b', 'new', []),
+                 make_event('a', 'remediated', ['quarantine', 'restore'])]
+        self.assertEqual(self.store.upsert(batch, self.flattener), 2)
+
+        events = {event['eventId']: event for event in self.store.query()}
+        self.assertEqual(events['a']['state'], 'remediated')
+        self.assertEqual([event['eventId'] for event in self.store.query(action_type='restore')], ['a'])
+        self.assertEqual(self.store.connection.execute('SELECT COUNT(*) FROM actions').fetchone()[0], 2)
+        self.assertEqual(self.store.connection.execute('SELECT COUNT(*) FROM recipients').fetchone()[0], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import unittest
+from time import sleep
+from unittest import mock
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import HEC_log_retirval_automated_bash as hec
+from mock_collector import MockCollector
+
+
+def make_events(count):
+    return [{'eventId': f'event-{index}', 'severity': '3', 'eventCreated': '2024-01-01T00:00:00+00:00',
+             'description': 'Phishing email sent to user@example.com ' * 4} for index in range(count)]
+
+
+class HttpCollectorTest(unittest.TestCase):
+    def start_collector(self, **kwargs):
+        collector = MockCollector(token='secret', **kwargs).start()
+        self.addCleanup(collector.stop)
+        return collector
+
+    def make_sink(self, collector, **kwargs):
+        sink = hec.HttpCollector(collector.url, 'secret', **kwargs)
+        self.addCleanup(sink.close)
+        return sink
+
+    def test_gzip_batches_by_count(self):
+        collector = self.start_collector()
+        sink = self.make_sink(collector, batch_events=10, linger=60)
+        events = make_events(35)
+        sink.send(events)
+
+        stats = collector.stats()
+        self.assertEqual(stats['requests'], 4)
+        # Batches upload concurrently, so only the set of events is fixed
+        self.assertEqual(sorted(collector.events, key=lambda event: event['eventId']),
+                         sorted(events, key=lambda event: event['eventId']))
+        # Bodies were sent gzip-compressed and decoded by the collector
+        self.assertLess(stats['bytes_received'], stats['bytes_uncompressed'])
+        self.assertEqual(sink.bytes_sent, stats['bytes_received'])
+
+    def test_batches_by_bytes(self):
+        collector = self.start_collector()
+        sink = self.make_sink(collector, batch_events=1000, linger=60)
+        sink.batch_bytes = len(sink.encode(make_events(1)[0])) * 5
+        sink.send(make_events(20))
+
+        self.assertEqual(collector.stats()['requests'], 4)
+        self.assertEqual(len(collector.events), 20)
+
+    def test_linger_flushes_partial_batch(self):
+        collector = self.start_collector()
+        sink = self.make_sink(collector, batch_events=100, linger=0.2)
+        seen_while_waiting = []
+
+        def slow_source():
+            yield from make_events(3)
+            # The fetch stage is waiting on the API; the partial batch should not wait with it
+            sleep(1.0)
+            seen_while_waiting.append(collector.stats()['events'])
+            yield from make_events(2)
+
+        sink.send(slow_source())
+        self.assertEqual(seen_while_waiting, [3])
+        self.assertEqual(collector.stats()['requests'], 2)
+
+    def test_retries_server_errors(self):
+        collector = self.start_collector(error_rate=0.4, seed=3)
+        sink = self.make_sink(collector, batch_events=10, linger=60, max_retries=10)
+        events = make_events(100)
+        with mock.patch.object(hec, 'BACKOFF_BASE', 0.01):
+            sink.send(events)
+
+        stats = collector.stats()
+        self.assertGreater(stats['errors_injected'], 0)
+        self.assertEqual(sink.retries, stats['errors_injected'])
+        self.assertEqual(sorted(event['eventId'] for event in collector.events),
+                         sorted(event['eventId'] for event in events))
+
+    def test_rejected_token_raises(self):
+        collector = self.start_collector()
+        sink = hec.HttpCollector(collector.url, 'wrong', batch_events=10, linger=60)
+        self.addCleanup(lambda: sink.pool.shutdown(wait=True))
+        with self.assertRaises(requests.exceptions.HTTPError):
+            sink.send(make_events(5))
+        self.assertEqual(collector.events, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import gzip
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import HEC_log_retirval_automated_bash as hec
+from mock_hec_server import MockHecServer
+
+
+class OutputRotationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.server = MockHecServer(total_events=3000, page_size=500).start()
+        self.addCleanup(self.server.stop)
+
+    def test_poller_rotates_compresses_and_rewrites_header(self):
+        output_file = os.path.join(self.directory.name, 'HEC_log.csv')
+        state_file = os.path.join(self.directory.name, 'state.json')
+        # The synthetic events start at 2024-01-01T00:00:00Z, one per second
+        with open(state_file, 'w') as file:
+            json.dump({'endDate': '2024-01-01T00:00:00Z'}, file)
+        args = hec.build_parser().parse_args([
+            '--client-id', 'test', '--access-key', 'test', '--host', self.server.host,
+            '--file-type', 'csv', '--output-file', output_file, '--state-file', state_file,
+            '--max-catchup', '1200', '--rotate-size-mb', '0.5', '--pipeline-depth', '0'
+        ])
+        poller = hec.TenantPoller(args)
+        poller.client = hec.ApiClient('test', 'test', self.server.host, scheme='http')
+
+        # The first window fills the file past 0.5 MB, so the second one starts a new segment
+        poller.turn()
+        poller.turn()
+        poller.rotator.close()
+
+        segments = [name for name in os.listdir(self.directory.name) if name.startswith('HEC_log.csv.')]
+        self.assertEqual(len(segments), 1)
+        self.assertTrue(segments[0].endswith('.gz'))
+
+        header = ','.join(hec.EventFlattener('').columns())
+        with gzip.open(os.path.join(self.directory.name, segments[0]), 'rt', newline='') as file:
+            rotated = file.read().splitlines()
+        with open(output_file, newline='') as file:
+            current = file.read().splitlines()
+        self.assertEqual(rotated[0], header)
+        self.assertEqual(current[0], header)
+        self.assertEqual(rotated.count(header) + current.count(header), 2)
+
+    def test_prune_keeps_newest_segments_with_collision_suffixes(self):
+        output_file = os.path.join(self.directory.name, 'HEC_log.csv')
+        names = ['HEC_log.csv.20240101T000000.gz', 'HEC_log.csv.20240101T000000-1.gz',
+                 'HEC_log.csv.20240101T000000-2.gz', 'HEC_log.csv.20240101T000000-10.gz',
+                 'HEC_log.csv.20240101T000001.gz']
+        for name in names:
+            open(os.path.join(self.directory.name, name), 'w').close()
+        rotator = hec.OutputRotator(output_file, keep=2)
+        self.addCleanup(rotator.close)
+        rotator._prune()
+        self.assertEqual(sorted(name for name in os.listdir(self.directory.name) if name.startswith('HEC_log.csv.')),
+                         ['HEC_log.csv.20240101T000000-10.gz', 'HEC_log.csv.20240101T000001.gz'])
+
+
+if __name__ == '__main__':
+    unittest.main()
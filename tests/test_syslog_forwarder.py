@@ -0,0 +1,183 @@
+import json
+import os
+import re
+import shutil
+import socket
+import ssl
+import sys
+import tempfile
+import threading
+import unittest
+from time import monotonic, sleep
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import HEC_log_retirval_automated_bash as hec
+from bench_transport import make_certificate
+
+# <PRI>1 TIMESTAMP HOSTNAME APP-NAME PROCID MSGID [SD] MSG
+RFC5424 = re.compile(rb'^<(\d+)>1 (\S+) (\S+) hec-log-retrieval (\d+) (\S+) (\[hec@32473 [^\]]*\]) (.*)$', re.S)
+
+
+class FramingListener:
+    """TCP/TLS collector that splits RFC 6587 octet-counted frames; can be restarted on the same port."""
+
+    def __init__(self, port=0, context=None):
+        self.context = context
+        self.messages = []
+        self.lock = threading.Lock()
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        self.connections = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections.append(connection)
+            threading.Thread(target=self._read, args=(connection,), daemon=True).start()
+
+    def _read(self, connection):
+        if self.context is not None:
+            try:
+                connection = self.context.wrap_socket(connection, server_side=True)
+            except OSError:
+                return
+            self.connections.append(connection)
+        buffer = b''
+        while True:
+            try:
+                data = connection.recv(1 << 16)
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data
+            while True:
+                length, space, rest = buffer.partition(b' ')
+                if not space or len(rest) < int(length):
+                    break
+                with self.lock:
+                    self.messages.append(rest[:int(length)])
+                buffer = rest[int(length):]
+
+    def wait_for(self, count, timeout=10):
+        deadline = monotonic() + timeout
+        while monotonic() < deadline:
+            with self.lock:
+                if len(self.messages) >= count:
+                    return list(self.messages)
+            sleep(0.01)
+        return list(self.messages)
+
+    def stop(self):
+        # shutdown() wakes the thread blocked in accept(), so the port is really released
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        for connection in self.connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
+
+
+def make_events(count, start=0):
+    return [{'eventId': f'event-{index}', 'saas': 'office365_emails', 'severity': str(index % 5 + 1),
+             'type': 'phishing', 'description': f'Café ✉ "quoted" ] message {index}\nsecond line'}
+            for index in range(start, start + count)]
+
+
+class SyslogForwarderTest(unittest.TestCase):
+    def setUp(self):
+        self.listener = FramingListener()
+        self.addCleanup(lambda: self.listener.stop())
+
+    def test_rfc5424_messages_with_octet_counting(self):
+        forwarder = hec.SyslogForwarder('127.0.0.1', self.listener.port, 'tcp', batch_size=7)
+        self.addCleanup(forwarder.close)
+        events = make_events(25)
+        forwarder.send(events)
+
+        messages = self.listener.wait_for(25)
+        self.assertEqual(len(messages), 25)
+        for event, message in zip(events, messages):
+            match = RFC5424.match(message)
+            self.assertIsNotNone(match, message)
+            priority, _, _, _, msgid, structured, body = match.groups()
+            expected_severity = hec.SyslogForwarder.SEVERITY_LEVELS[event['severity']]
+            self.assertEqual(int(priority), hec.SYSLOG_FACILITY * 8 + expected_severity)
+            self.assertEqual(msgid, b'phishing')
+            self.assertIn(f'eventId="{event["eventId"]}"'.encode(), structured)
+            # The frame length counts bytes, so multi-byte text arrives intact
+            self.assertEqual(json.loads(body.decode('utf-8')), event)
+
+    def test_reconnects_after_listener_restart(self):
+        forwarder = hec.SyslogForwarder('127.0.0.1', self.listener.port, 'tcp')
+        self.addCleanup(forwarder.close)
+        forwarder.send(make_events(10))
+        self.assertEqual(len(self.listener.wait_for(10)), 10)
+
+        port = self.listener.port
+        self.listener.stop()
+        sleep(0.1)
+        self.listener = FramingListener(port)
+
+        forwarder.send(make_events(10, start=10))
+        messages = self.listener.wait_for(10)
+        received = [json.loads(RFC5424.match(message).group(7))['eventId'] for message in messages]
+        self.assertEqual(received, [f'event-{index}' for index in range(10, 20)])
+        self.assertEqual(forwarder.reconnects, 1)
+
+
+@unittest.skipIf(shutil.which('openssl') is None, 'needs the openssl binary for a self-signed certificate')
+class SyslogForwarderTlsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.certfile, keyfile = make_certificate(directory.name)
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(self.certfile, keyfile)
+        self.listener = FramingListener(context=self.context)
+        self.addCleanup(lambda: self.listener.stop())
+
+    def test_session_tickets_do_not_force_reconnects(self):
+        # TLS 1.3 servers send session tickets after the handshake, leaving the socket readable
+        forwarder = hec.SyslogForwarder('127.0.0.1', self.listener.port, 'tls', ca_file=self.certfile)
+        self.addCleanup(forwarder.close)
+        for batch in range(5):
+            forwarder.send(make_events(10, start=batch * 10))
+            self.assertEqual(len(self.listener.wait_for((batch + 1) * 10)), (batch + 1) * 10)
+        self.assertEqual(forwarder.reconnects, 0)
+
+    def test_reconnects_after_listener_restart(self):
+        forwarder = hec.SyslogForwarder('127.0.0.1', self.listener.port, 'tls', ca_file=self.certfile)
+        self.addCleanup(forwarder.close)
+        forwarder.send(make_events(10))
+        self.assertEqual(len(self.listener.wait_for(10)), 10)
+
+        port = self.listener.port
+        self.listener.stop()
+        sleep(0.1)
+        self.listener = FramingListener(port, self.context)
+
+        forwarder.send(make_events(10, start=10))
+        messages = self.listener.wait_for(10)
+        received = [json.loads(RFC5424.match(message).group(7))['eventId'] for message in messages]
+        self.assertEqual(received, [f'event-{index}' for index in range(10, 20)])
+        self.assertEqual(forwarder.reconnects, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()